@@ -0,0 +1,161 @@
+"""Benchmark suite for the middleware layer, run against a throwaway database.
+
+Builds a synthetic MorningRoutine database of a configurable size in a
+temporary directory, or in memory with --memory (the real MorningRoutine.db
+is never opened), times the
+hot middleware calls and writes the results as JSON so runs can be compared.
+
+Run: python Benchmarks.py [--notes 100000] [--tasks 10000] [--rotation 1000]
+                          [--repeat 5] [--memory] [--output bench_results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import DBCommands
+from DBMiddleware import (add_tasks, add_house_maint_tasks, add_notes, list_tasks,
+                          get_house_maint_task_by_date, list_notes, list_notes_page,
+                          list_notes_by_date, get_yestedays_note)
+
+def _time_call(func, repeat: int) -> list:
+    """Call func `repeat` times and return each duration in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+def _summarize(name: str, timings: list, rows: int | None = None) -> dict:
+    """Build the JSON record for one benchmark."""
+    result = {
+        'name': name,
+        'repeat': len(timings),
+        'min_ms': min(timings),
+        'median_ms': statistics.median(timings),
+        'mean_ms': statistics.fmean(timings),
+        'max_ms': max(timings),
+    }
+    if rows is not None:
+        result['rows'] = rows
+    return result
+
+def _random_time(rng) -> tuple:
+    """Return a random (FromTime, ToTime) pair in HH:MM format within one day."""
+    start = rng.randrange(0, 23 * 60)
+    end = min(start + rng.choice((15, 30, 45, 60)), 23 * 60 + 59)
+    return f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"
+
+def seed_database(rng, n_notes: int, n_tasks: int, n_rotation: int, days: int) -> list:
+    """Fill the open database with synthetic rows using the bulk insert paths.
+    Returns: benchmark records for the bulk inserts themselves.
+    """
+    results = []
+
+    names = [f"Rotation task {i}" for i in range(n_rotation)]
+    timings = _time_call(lambda: add_house_maint_tasks(names), 1)
+    results.append(_summarize('add_house_maint_tasks', timings, n_rotation))
+
+    tasks = []
+    for i in range(max(0, n_tasks - 1)):
+        fr, to = _random_time(rng)
+        tasks.append((fr, to, f"Task {i}", rng.random() < 0.9))
+    tasks.append(('09:30', '10:00', 'House Maintenance Task', True))
+    timings = _time_call(lambda: add_tasks(tasks), 1)
+    results.append(_summarize('add_tasks', timings, len(tasks)))
+
+    # Notes are spread over the last `days` days so date lookups find data
+    today = datetime.now().date()
+    notes = [(f"Note {i} {rng.choice(('AAPL', 'MSFT', 'PAYX', 'CSCO', 'QLYS'))}",
+              (today - timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d'))
+             for i in range(n_notes)]
+    timings = _time_call(lambda: add_notes(notes), 1)
+    results.append(_summarize('add_notes', timings, n_notes))
+
+    return results
+
+def run_benchmarks(repeat: int, days: int) -> list:
+    """Time the read paths against the seeded database."""
+    today = datetime.now()
+    some_day = (today - timedelta(days=days // 2)).strftime('%Y-%m-%d')
+    results = []
+
+    def consume_notes():
+        return sum(1 for _ in list_notes())
+
+    cases = [
+        ('list_tasks', list_tasks),
+        ('get_house_maint_task_by_date', lambda: get_house_maint_task_by_date(today.strftime('%m/%d/%y'))),
+        ('list_notes', consume_notes),
+        ('list_notes_page', lambda: list_notes_page(limit=20)),
+        ('list_notes_by_date', lambda: list_notes_by_date(some_day)),
+        ('get_yestedays_note', get_yestedays_note),
+    ]
+    for name, func in cases:
+        func()      # warm-up: fills the pool, page cache and any in-process caches
+        results.append(_summarize(name, _time_call(func, repeat)))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MorningRoutine middleware on a synthetic database.")
+    parser.add_argument('--notes', type=int, default=100_000, help="number of end of day notes (default 100000)")
+    parser.add_argument('--tasks', type=int, default=10_000, help="number of tasks (default 10000)")
+    parser.add_argument('--rotation', type=int, default=1_000, help="number of house maintenance tasks (default 1000)")
+    parser.add_argument('--days', type=int, default=3 * 365, help="spread notes over this many days (default 1095)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per read benchmark (default 5)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for the synthetic data (default 42)")
+    parser.add_argument('--output', default='bench_results.json', help="JSON results file (default bench_results.json)")
+    parser.add_argument('--memory', action='store_true', help="use an in-memory database instead of a temporary file")
+    parser.add_argument('--keep', action='store_true', help="keep the generated database and print its path")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='morningroutine_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    rng = random.Random(args.seed)
+
+    DBCommands.close_db()
+    DBCommands.open_db(DBCommands.MEMORY_DB if args.memory else db_path)
+    try:
+        results = seed_database(rng, args.notes, args.tasks, args.rotation, max(1, args.days))
+        results += run_benchmarks(max(1, args.repeat), max(1, args.days))
+        if args.memory and args.keep:
+            DBCommands.snapshot_db(db_path).close()
+    finally:
+        DBCommands.close_db()
+        if args.keep:
+            print(f"Benchmark database kept at {db_path}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'database': 'memory' if args.memory else 'file',
+            'sizes': {'notes': args.notes, 'tasks': args.tasks, 'rotation': args.rotation, 'days': args.days},
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'Benchmark':<30} {'Median ms':>10} {'Min ms':>10}")
+    print(f"{'-' * 30} {'-' * 10} {'-' * 10}")
+    for r in results:
+        print(f"{r['name']:<30} {r['median_ms']:>10.3f} {r['min_ms']:>10.3f}")
+    print(f"\nResults written to {args.output}")
+
+if __name__ == '__main__':
+    main()
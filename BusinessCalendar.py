@@ -0,0 +1,144 @@
+"""Business-day calendar: which days are working days, and the working day before a date.
+
+The weekend and a holiday file are set in MorningRoutine.ini (see Settings.py):
+
+    [calendar]
+    weekend = sat, sun
+    holidays_file = holidays.txt
+
+The holiday file lists one YYYY-MM-DD date per line; text after the date and
+lines starting with # are ignored.  With no settings the weekend is Saturday
+and Sunday and there are no holidays.
+
+"Previous working day" answers come from a table built once per calendar
+(the previous working day for every date within two years either side of
+the date asked about), so the per-call cost is one array lookup.
+"""
+import os
+from array import array
+from datetime import date
+from GenericFunctions import to_date
+from Settings import get_setting
+
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+DEFAULT_WEEKEND = 'sat, sun'
+DEFAULT_HOLIDAYS_FILE = 'holidays.txt'
+
+# Days either side of a requested date covered when the lookup table is (re)built
+_TABLE_MARGIN = 2 * 366
+# Extra days scanned before the table so its first entries have a working day behind them
+_SCAN_BACK = 60
+
+def parse_weekend(text: str) -> frozenset:
+    """Parse day names like 'sat, sun' (or 'fri sat') into weekday numbers (Monday=0)."""
+    days = set()
+    for part in text.replace(',', ' ').split():
+        name = part.lower()[:3]
+        if name not in DAY_NAMES:
+            raise ValueError(f"Unknown weekend day '{part}'. Use day names such as sat, sun.")
+        days.add(DAY_NAMES.index(name))
+    if len(days) == 7:
+        raise ValueError("The weekend can't be every day of the week.")
+    return frozenset(days)
+
+def load_holidays(path: str) -> frozenset:
+    """Read holiday dates from a file; a missing file means no holidays."""
+    if not os.path.exists(path):
+        return frozenset()
+    holidays = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            text = line.split('#', 1)[0].strip()
+            if not text:
+                continue
+            token = text.split()[0]
+            try:
+                holidays.add(date.fromisoformat(token))
+            except ValueError:
+                raise ValueError(f"{path} line {line_number}: expected a YYYY-MM-DD date, not '{token}'") from None
+    return frozenset(holidays)
+
+class BusinessCalendar:
+    """Working days for a given weekend (weekday numbers, Monday=0) and set of holiday dates."""
+
+    def __init__(self, weekend=frozenset((5, 6)), holidays=()):
+        self.weekend = frozenset(weekend)
+        if len(self.weekend) >= 7:
+            raise ValueError("The weekend can't be every day of the week.")
+        self.holidays = frozenset(holidays)
+        self._holiday_ordinals = frozenset(d.toordinal() for d in self.holidays)
+        # (first ordinal covered, array of previous-working-day ordinals; 0 = none found)
+        # kept as one tuple so readers never see a half-rebuilt table
+        self._table = (0, array('i'))
+
+    def _is_working_ordinal(self, ordinal: int) -> bool:
+        # date.fromordinal(1) is a Monday
+        return (ordinal - 1) % 7 not in self.weekend and ordinal not in self._holiday_ordinals
+
+    def _build(self, ordinal: int):
+        """Rebuild the lookup table so it covers ordinal (and everything it covered before)."""
+        first, previous = self._table
+        start, end = ordinal - _TABLE_MARGIN, ordinal + _TABLE_MARGIN
+        if previous:
+            start, end = min(start, first), max(end, first + len(previous) - 1)
+        table = array('i')
+        last_working = 0
+        for o in range(start - _SCAN_BACK, end + 1):
+            if o >= start:
+                table.append(last_working)
+            if self._is_working_ordinal(o):
+                last_working = o
+        self._table = (start, table)
+
+    def is_working_day(self, day) -> bool:
+        """Return True if day (date, datetime or MM/DD/YY string) is neither a weekend day nor a holiday."""
+        return self._is_working_ordinal(to_date(day).toordinal())
+
+    def previous_working_day(self, day) -> date:
+        """Return the last working day strictly before day."""
+        ordinal = to_date(day).toordinal()
+        first, previous = self._table
+        if not 0 <= ordinal - first < len(previous):
+            self._build(ordinal)
+            first, previous = self._table
+        found = previous[ordinal - first]
+        if not found:
+            # Only when holidays and weekends block more than _SCAN_BACK days in a row
+            found = ordinal - 1
+            while not self._is_working_ordinal(found):
+                found -= 1
+        return date.fromordinal(found)
+
+    def last_working_days(self, count: int, before) -> list:
+        """Return the `count` working days before `before`, most recent first."""
+        days = []
+        day = before
+        for _ in range(count):
+            day = self.previous_working_day(day)
+            days.append(day)
+        return days
+
+# Calendar built from the settings, created on first use
+_calendar = None
+
+def get_calendar() -> BusinessCalendar:
+    """Return the calendar configured in the [calendar] settings."""
+    global _calendar
+    if _calendar is None:
+        weekend = parse_weekend(get_setting('calendar', 'weekend', DEFAULT_WEEKEND))
+        holidays = load_holidays(get_setting('calendar', 'holidays_file', DEFAULT_HOLIDAYS_FILE))
+        _calendar = BusinessCalendar(weekend, holidays)
+    return _calendar
+
+def reload_calendar():
+    """Forget the configured calendar so the next lookup re-reads the settings and holiday file."""
+    global _calendar
+    _calendar = None
+
+def previous_working_day(day=None) -> date:
+    """Return the working day before day (default today)."""
+    return get_calendar().previous_working_day(day or date.today())
+
+def last_working_days(count: int, before=None) -> list:
+    """Return the `count` working days before `before` (default today), most recent first."""
+    return get_calendar().last_working_days(count, before or date.today())
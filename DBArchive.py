@@ -0,0 +1,85 @@
+"""Moves old end of day notes out of MorningRoutine.db into the notes archive.
+
+The archive is a separate SQLite file (MorningRoutine_archive.db by default)
+that DBCommands attaches to every connection as the `archive` schema, so
+list_notes, search_notes and the other note reads still see archived notes.
+Keeping old notes out of the hot file keeps it small, cache-resident and
+quick to back up.
+
+Settings (see Settings.py):
+
+    [archive]
+    path = MorningRoutine_archive.db    ; archive file for the configured database
+    days = 365                          ; archive notes older than this many days
+
+Run: python TaskCLI.py archive [--days N] [--vacuum]
+"""
+from datetime import date, timedelta
+from DBCommands import run_sql, transaction, ARCHIVE_SCHEMA
+from DBSync import ARCHIVE_ORIGIN
+from Settings import get_setting
+
+DEFAULT_ARCHIVE_DAYS = 365
+
+# Notes moved per transaction, so the write lock is never held for long
+ARCHIVE_BATCH_SIZE = 500
+
+def archive_cutoff(days: int | None = None) -> str:
+    """Return the YYYY-MM-DD date before which notes are archived (today minus days)."""
+    if days is None:
+        days = int(get_setting('archive', 'days', str(DEFAULT_ARCHIVE_DAYS)))
+    if days < 0:
+        raise ValueError("The archive age can't be negative.")
+    return (date.today() - timedelta(days=days)).isoformat()
+
+def count_archivable_notes(days: int | None = None) -> int:
+    """Return how many notes archive_notes(days) would move."""
+    results = run_sql("SELECT COUNT(*) FROM main.end_of_day_notes WHERE DateAdded < ?", (archive_cutoff(days),))
+    return results[0][0]
+
+def archive_notes(days: int | None = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move notes older than `days` days (default: [archive] days setting) into the archive.
+    Each batch of batch_size notes (oldest first) is copied into the archive in
+    one transaction, keeping its id, and deleted from MorningRoutine.db in a
+    second one.  Under WAL a transaction spanning both files is only atomic per
+    file, so the copy is committed before the delete starts: an interrupted run
+    can leave a note in both files, never in neither.  A copy that is already in
+    the archive is overwritten, so the job can simply be run again.
+    Returns: number of notes moved.
+    """
+    cutoff = archive_cutoff(days)
+    batch_size = max(1, batch_size)
+    moved = 0
+    while True:
+        with transaction():
+            # Last (DateAdded, id) of this batch; the copy and the delete both use that range
+            last = run_sql("""SELECT DateAdded, id FROM main.end_of_day_notes WHERE DateAdded < ?
+                              ORDER BY DateAdded, id LIMIT 1 OFFSET ?""", (cutoff, batch_size - 1))
+            if last:
+                batch, params = "DateAdded < ? AND (DateAdded, id) <= (?, ?)", (cutoff,) + tuple(last[0])
+            else:
+                # Fewer than batch_size notes left: take them all
+                batch, params = "DateAdded < ?", (cutoff,)
+            run_sql(f"""INSERT INTO {ARCHIVE_SCHEMA}.end_of_day_notes (id, note, DateAdded)
+                        SELECT id, note, DateAdded FROM main.end_of_day_notes WHERE {batch}
+                        ON CONFLICT (id) DO UPDATE SET note = excluded.note, DateAdded = excluded.DateAdded""",
+                    params)
+        with transaction():
+            # Tagged in the change log so the deletes aren't synced to replicas (see DBSync)
+            run_sql("UPDATE sync_node SET apply_origin = ?", (ARCHIVE_ORIGIN,))
+            # Only notes whose archived copy matches: one edited since the copy stays
+            # here and is copied again by the next batch
+            deleted = run_sql(f"""DELETE FROM main.end_of_day_notes WHERE {batch}
+                                  AND EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.end_of_day_notes a
+                                              WHERE a.id = main.end_of_day_notes.id
+                                                AND a.note = main.end_of_day_notes.note
+                                                AND a.DateAdded = main.end_of_day_notes.DateAdded)""", params)
+            run_sql("UPDATE sync_node SET apply_origin = NULL")
+        moved += deleted
+        if not last or not deleted:
+            break
+    return moved
+
+def vacuum_database():
+    """Rebuild MorningRoutine.db so the space freed by archiving is returned to the file system."""
+    run_sql("VACUUM main")
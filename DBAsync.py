@@ -0,0 +1,118 @@
+"""Asyncio facade over DBMiddleware.
+
+Every async_<name> coroutine runs the synchronous DBMiddleware function <name>
+on a dedicated executor thread and returns (or raises) exactly what that
+function would, so the event loop never blocks on SQLite.
+
+- Reads run concurrently on a small thread pool, one pooled connection each.
+- Writes are queued on a single writer thread.  SQLite allows one writer at a
+  time anyway, so serializing them in-process avoids lock contention and busy
+  retries between our own coroutines.
+
+Example:
+    tasks = await async_list_plan_tasks()
+    note_id = await async_add_note("Check PAYX")
+    async for note in async_list_notes():
+        ...
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import DBCommands
+import DBMiddleware
+
+_executor_lock = threading.Lock()
+_read_executor = None
+_write_executor = None
+
+def _executors() -> tuple:
+    """Create the reader pool and writer thread on first use."""
+    global _read_executor, _write_executor
+    with _executor_lock:
+        if _read_executor is None:
+            # Size from the pool actually open (e.g. TaskServer's workers + 1),
+            # leaving one pooled connection free for the writer thread
+            DBCommands.open_db()
+            readers = max(1, DBCommands.get_pool_size() - 1)
+            _read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-read')
+            _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        return _read_executor, _write_executor
+
+def shutdown_async_db(wait: bool = True):
+    """Stop the executor threads (they restart on the next call)."""
+    global _read_executor, _write_executor
+    with _executor_lock:
+        executors = (_read_executor, _write_executor)
+        _read_executor = _write_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+def _make_async(func, writer: bool):
+    """Wrap a synchronous middleware function as a coroutine function."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        read_executor, write_executor = _executors()
+        executor = write_executor if writer else read_executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    wrapper.__name__ = wrapper.__qualname__ = f"async_{func.__name__}"
+    return wrapper
+
+def _reader(func):
+    return _make_async(func, writer=False)
+
+def _writer(func):
+    return _make_async(func, writer=True)
+
+# Tasks
+async_list_tasks = _reader(DBMiddleware.list_tasks)
+async_list_plan_tasks = _reader(DBMiddleware.list_plan_tasks)
+# Usually a read; when the stored plan is stale it is rebuilt with one short write
+async_get_daily_plan = _reader(DBMiddleware.get_daily_plan)
+async_get_task = _reader(DBMiddleware.get_task)
+async_add_task = _writer(DBMiddleware.add_task)
+async_add_tasks = _writer(DBMiddleware.add_tasks)
+async_update_task = _writer(DBMiddleware.update_task)
+async_delete_task = _writer(DBMiddleware.delete_task)
+async_toggle_task_active = _writer(DBMiddleware.toggle_task_active)
+
+# House maintenance tasks
+async_get_all_house_maint_tasks = _reader(DBMiddleware.get_all_house_maint_tasks)
+async_get_house_maint_task = _reader(DBMiddleware.get_house_maint_task)
+async_get_house_maint_task_by_date = _reader(DBMiddleware.get_house_maint_task_by_date)
+async_get_house_maint_rotation = _reader(DBMiddleware.get_house_maint_rotation)
+async_get_house_maint_schedule = _reader(DBMiddleware.get_house_maint_schedule)
+async_add_house_maint_task = _writer(DBMiddleware.add_house_maint_task)
+async_add_house_maint_tasks = _writer(DBMiddleware.add_house_maint_tasks)
+async_update_house_maint_task = _writer(DBMiddleware.update_house_maint_task)
+async_delete_house_maint_task = _writer(DBMiddleware.delete_house_maint_task)
+
+# End of day notes
+async_get_note = _reader(DBMiddleware.get_note)
+async_list_notes_page = _reader(DBMiddleware.list_notes_page)
+async_list_notes_by_date = _reader(DBMiddleware.list_notes_by_date)
+async_list_notes_between = _reader(DBMiddleware.list_notes_between)
+async_list_notes_for_working_days = _reader(DBMiddleware.list_notes_for_working_days)
+async_search_notes = _reader(DBMiddleware.search_notes)
+async_get_todays_note = _reader(DBMiddleware.get_todays_note)
+async_get_yestedays_note = _reader(DBMiddleware.get_yestedays_note)
+async_add_note = _writer(DBMiddleware.add_note)
+async_add_notes = _writer(DBMiddleware.add_notes)
+async_update_note = _writer(DBMiddleware.update_note)
+async_delete_note = _writer(DBMiddleware.delete_note)
+
+async def async_list_notes(batch_size: int = 500):
+    """Async iterator over all notes, newest first.
+    Rows are fetched batch_size at a time with list_notes_page (keyset paging), so
+    no pooled connection is held between batches however many iterators are open."""
+    after = None
+    while True:
+        batch = await async_list_notes_page(after=after, limit=batch_size)
+        for row in batch:
+            yield row
+        if len(batch) < batch_size:
+            break
+        after = (batch[-1][2], batch[-1][0])
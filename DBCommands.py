@@ -1,56 +1,617 @@
+import itertools
 import os
+import queue
+import random
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from GenericFunctions import parse_date
+from DBMigrations import migrate, ARCHIVE_MIGRATIONS
+from Settings import get_setting, get_section
+import DBStats
 
 # Module-level constant for the database name
 DB_NAME = 'MorningRoutine.db'
 
+# How open_db attaches the pool to a database:
+# - file:   the database file itself (default)
+# - memory: a new, empty in-memory database (also chosen by the path ':memory:')
+# - copy:   an in-memory copy of the database file; changes never reach the file
+# Set with open_db(mode=...), or `path` / `mode` in the [database] settings
+# (MORNINGROUTINE_DATABASE_PATH / MORNINGROUTINE_DATABASE_MODE).
+DB_MODES = ('file', 'memory', 'copy')
+MEMORY_DB = ':memory:'
+
+# Old notes are moved to a separate archive database (see DBArchive), attached
+# to every pooled connection under this schema name.  In the memory modes the
+# archive is in memory too ('copy' loads the archive file alongside the database).
+ARCHIVE_SCHEMA = 'archive'
+
+# Maximum number of connections kept open by the pool
+POOL_SIZE = 5
+
+# Named PRAGMA profiles applied to every new connection.  Pick one with
+# `profile = <name>` in the [database] section of MorningRoutine.ini or the
+# MORNINGROUTINE_DATABASE_PROFILE environment variable; any single pragma can
+# also be overridden in that section (e.g. `cache_size = -16000`).
+PRAGMA_PROFILES = {
+    # WAL lets readers run while a write is in progress; synchronous=NORMAL is
+    # durable across application crashes and only fsyncs at checkpoints.
+    'default': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -8000,
+                'mmap_size': 64 * 1024 * 1024, 'busy_timeout': 5000},
+    # WAL concurrency, but fsync on every commit (survives power loss)
+    'safe': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'cache_size': -8000,
+             'mmap_size': 0, 'busy_timeout': 5000},
+    # SQLite's out-of-the-box behaviour (rollback journal, synchronous FULL)
+    'legacy': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'cache_size': -2000,
+               'mmap_size': 0, 'busy_timeout': 5000},
+}
+DEFAULT_PROFILE = 'default'
+
+# Accepted values for the pragmas a profile may set (others are integers)
+_PRAGMA_CHOICES = {
+    'journal_mode': {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA', '0', '1', '2', '3'},
+}
+
+# Retry policy for "database is locked" / SQLITE_BUSY.  The busy_timeout pragma
+# already makes SQLite wait inside a statement; these retries cover the cases
+# where SQLite gives up immediately or the timeout runs out.
+BUSY_RETRIES = 6            # attempts after the first one
+BUSY_BASE_DELAY = 0.005     # seconds; doubled after every attempt
+BUSY_MAX_DELAY = 0.5
+
+class DBError(Exception):
+    """A database operation failed.  `sql` holds the statement when known."""
+    def __init__(self, message: str, sql: str | None = None):
+        super().__init__(message)
+        self.sql = sql
+
+class DBBusyError(DBError):
+    """The database stayed locked by another connection after every retry."""
+
+class DBIntegrityError(DBError):
+    """A constraint (NOT NULL, UNIQUE, ...) rejected the change."""
+
+# How often the busy/retry path runs (see get_retry_stats)
+_retry_stats = {'busy_errors': 0, 'retries': 0, 'gave_up': 0}
+
+# Connection pool state (guarded by _pool_lock)
+_pool_lock = threading.Lock()
+_idle = None            # queue.LifoQueue of idle connections, None when the pool is closed
+_all_conns = []         # every connection the pool has opened
+_db_path = None
+_db_uri = False         # True when _db_path is a shared-cache in-memory URI
+_archive_path = None    # archive database attached by _connect()
+_memory_names = itertools.count(1)
+_pool_size = POOL_SIZE
+_monitor = None         # read-only connection used by data_version()
+_pragmas = None         # resolved PRAGMA profile, applied by _connect()
+
+# Per-thread connection of the transaction() block currently running, if any
+_local = threading.local()
+
+# Callbacks run by close_db() and restore_db() (see on_db_reset)
+_reset_hooks = []
+
 def GetConn():
     """Return a connection to the MorningRoutine.db database.
-    
+
     Returns:
     - sqlite3.Connection: Active database connection object
     """
-    dbPath = os.path.join(os.getcwd(), DB_NAME)
+    dbPath, mode = resolve_db_target()
+    if mode != 'file':
+        raise ValueError(f"GetConn() opens database files only; use open_db() for mode '{mode}'.")
     conn = sqlite3.connect(dbPath)
+    _apply_pragmas(conn, load_pragma_profile())
     return conn
 
-def run_sql(sql: str, params=None):
+def load_pragma_profile() -> dict:
+    """Return the PRAGMA settings chosen in MorningRoutine.ini / the environment.
+    Raises ValueError for an unknown profile name or an invalid pragma value.
     """
-    Connects to the SQLite database, executes the given SQL statement,
-    and returns the results (if any).
-    
-    Parameters:
-        sql (str): The SQL statement to execute.
-        params (tuple or dict, optional): Parameters for parameterized queries.
-    Returns:
-        For SELECT: list of tuples (query results)
-        For INSERT: lastrowid (int)
-        For UPDATE/DELETE: rowcount (int) 
-        On error: list with single tuple [("Error", error_message)]
+    name = get_setting('database', 'profile', DEFAULT_PROFILE).strip().lower()
+    if name not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown database profile '{name}'. Choose one of: {', '.join(PRAGMA_PROFILES)}")
+    pragmas = dict(PRAGMA_PROFILES[name])
+    overrides = get_section('database')
+    for key in pragmas:
+        if key in overrides:
+            pragmas[key] = overrides[key]
+
+    # Values end up in PRAGMA statements, so only accept known words or integers
+    for key, value in pragmas.items():
+        if key in _PRAGMA_CHOICES:
+            value = str(value).strip().upper()
+            if value not in _PRAGMA_CHOICES[key]:
+                raise ValueError(f"Invalid {key} '{value}' in database settings.")
+        else:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {key} '{value}' in database settings; expected an integer.") from None
+        pragmas[key] = value
+    return pragmas
+
+def _apply_pragmas(conn, pragmas: dict):
+    """Apply a PRAGMA profile to a freshly opened connection."""
+    for key, value in pragmas.items():
+        conn.execute(f"PRAGMA {key} = {value}")
+
+def resolve_db_target(db_path: str | None = None, mode: str | None = None) -> tuple:
+    """Return the (path, mode) open_db will use: the arguments if given, then the
+    [database] path/mode settings, then DB_NAME in the current directory in file mode.
+    Raises ValueError for an unknown mode."""
+    path = db_path or get_setting('database', 'path') or os.path.join(os.getcwd(), DB_NAME)
+    mode = (mode or get_setting('database', 'mode', 'file')).strip().lower()
+    if path == MEMORY_DB:
+        mode = 'memory'
+    if mode not in DB_MODES:
+        raise ValueError(f"Unknown database mode '{mode}'. Choose one of: {', '.join(DB_MODES)}")
+    return path, mode
+
+def resolve_archive_path(db_path: str | None = None) -> str:
+    """Return the archive file that goes with a database file.
+    The [archive] path setting applies to the configured database; a database
+    opened by explicit path (tests, benchmarks) gets <name>_archive.db beside it,
+    so it never shares the real archive."""
+    if db_path is None:
+        setting = get_setting('archive', 'path')
+        if setting:
+            return setting
+        db_path = resolve_db_target()[0]
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+def _load_copy(path: str, conn):
+    """Copy the database file at path into conn with the backup API."""
+    if not os.path.exists(path):
+        raise DBError(f"Can't copy '{path}' into memory: no such database file.")
+    source = sqlite3.connect(path)
+    try:
+        source.backup(conn)
+    except sqlite3.Error as e:
+        raise _db_error(e, None) from e
+    finally:
+        source.close()
+
+def open_db(db_path: str | None = None, pool_size: int = POOL_SIZE, mode: str | None = None):
+    """Open the connection pool used by run_sql.
+    Inputs:
+    - db_path: database file to use, or ':memory:' (default: settings, then DB_NAME in the current directory)
+    - pool_size: maximum number of connections held open at once
+    - mode: 'file', 'memory' or 'copy' (see DB_MODES; default from settings, else 'file')
+    Calling open_db while the pool is already open has no effect.
+    Any pending schema migrations are applied the first time the pool opens.
+
+    Example (tests and what-if edits that must not touch MorningRoutine.db):
+        open_db(mode='copy')
+    """
+    global _idle, _db_path, _db_uri, _archive_path, _pool_size, _monitor, _pragmas
+    with _pool_lock:
+        if _idle is not None:
+            return
+        path, mode = resolve_db_target(db_path, mode)
+        archive_file = resolve_archive_path(db_path)
+        if mode == 'file':
+            _db_path, _archive_path, _db_uri = path, archive_file, False
+        else:
+            # Named shared-cache memory databases, so every pooled connection sees the same data
+            name = f"morningroutine-{os.getpid()}-{next(_memory_names)}"
+            _db_path = f"file:{name}?mode=memory&cache=shared"
+            _archive_path = f"file:{name}-archive?mode=memory&cache=shared"
+            _db_uri = True
+        _pool_size = max(1, pool_size)
+        _pragmas = load_pragma_profile()
+        # Opened first: the monitor also keeps in-memory databases alive until close_db()
+        monitor = _connect()
+        try:
+            conn = sqlite3.connect(_archive_path, uri=_db_uri)
+            try:
+                if mode == 'copy' and os.path.exists(archive_file):
+                    _load_copy(archive_file, conn)
+                migrate(conn, ARCHIVE_MIGRATIONS)
+            finally:
+                conn.close()
+            conn = _connect()
+            try:
+                if mode == 'copy':
+                    _load_copy(path, conn)
+                migrate(conn)
+            finally:
+                conn.close()
+        except BaseException:
+            monitor.close()
+            raise
+        _monitor = monitor
+        _idle = queue.LifoQueue()
+
+def close_db():
+    """Close every pooled connection. The pool reopens on the next run_sql call."""
+    global _idle, _monitor
+    with _pool_lock:
+        conns = list(_all_conns)
+        _all_conns.clear()
+        if _monitor is not None:
+            conns.append(_monitor)
+        _idle = None
+        _monitor = None
+    for conn in conns:
+        conn.close()
+    _run_reset_hooks()
+
+def on_db_reset(callback):
+    """Register callback() to run whenever the pool's database is closed or its
+    contents replaced (close_db, restore_db), so in-process caches built from
+    the old data are dropped."""
+    _reset_hooks.append(callback)
+
+def _run_reset_hooks():
+    for callback in list(_reset_hooks):
+        callback()
+
+def snapshot_db(path: str | None = None) -> sqlite3.Connection:
+    """Copy the whole open database with the SQLite backup API (the notes archive is not included).
+    Inputs:
+    - path: write the copy to this database file instead of memory (e.g. to keep
+      what-if edits made in 'copy' mode)
+    Returns: a connection holding the copy; pass it to restore_db() and close() it when done.
     """
-    conn = GetConn()
+    if in_transaction():
+        raise DBError("snapshot_db() can't run inside a transaction() block.")
+    snapshot = sqlite3.connect(path or MEMORY_DB, check_same_thread=False)
+    try:
+        with pooled_connection() as conn:
+            _with_retry(lambda: conn.backup(snapshot), "backup")
+    except BaseException:
+        snapshot.close()
+        raise
+    return snapshot
+
+def restore_db(snapshot):
+    """Replace the open database's contents with a snapshot.
+    Inputs:
+    - snapshot: a connection from snapshot_db(), or the path of a database file
+    Example:
+        saved = snapshot_db()
+        ...                     # try out schedule edits
+        restore_db(saved)       # and throw them away
+        saved.close()
+    """
+    if in_transaction():
+        raise DBError("restore_db() can't run inside a transaction() block.")
+    if isinstance(snapshot, str):
+        if not os.path.exists(snapshot):
+            raise DBError(f"Can't restore '{snapshot}': no such database file.")
+        source = sqlite3.connect(snapshot)
+    else:
+        source = snapshot
+    try:
+        with pooled_connection() as conn:
+            _with_retry(lambda: source.backup(conn), "restore")
+            migrate(conn)       # a snapshot file may predate the current schema
+    finally:
+        if source is not snapshot:
+            source.close()
+    _run_reset_hooks()
+
+def data_version() -> int:
+    """Return a counter that changes whenever the database is modified.
+    Backed by PRAGMA data_version on a connection that never writes, so commits
+    from pooled connections and from other processes both move it.  Cheap enough
+    to call before every cached read.
+    """
+    open_db()
+    with _pool_lock:
+        return _monitor.execute("PRAGMA data_version").fetchone()[0]
+
+def get_table_version(table_name: str) -> int:
+    """Return the change counter for a table (see migration 4 in DBMigrations).
+    It goes up by one for every row inserted, updated or deleted in that table."""
+    results = run_sql("SELECT version FROM table_versions WHERE table_name = ?", (table_name,))
+    return results[0][0] if results else 0
+
+def get_pool_size() -> int:
+    """Return the maximum number of pooled connections (as set by the last open_db call)."""
+    return _pool_size
+
+def in_transaction() -> bool:
+    """Return True inside a transaction() block on the current thread."""
+    return getattr(_local, 'conn', None) is not None
+
+def _connect():
+    """Open a new connection to the pool's database file, with the archive attached."""
+    # check_same_thread=False: a pooled connection may be used by different
+    # threads over its lifetime, but only ever by one thread at a time.
+    conn = sqlite3.connect(_db_path, check_same_thread=False, uri=_db_uri)
+    _apply_pragmas(conn, _pragmas)
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (_archive_path,))
+    for key in ('journal_mode', 'synchronous'):
+        conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.{key} = {_pragmas[key]}")
+    if DBStats.enabled:
+        DBStats.count('connects')
+    return conn
+
+def _commit(conn):
+    """Commit on conn, counting the commit when statistics are enabled."""
+    conn.commit()
+    if DBStats.enabled:
+        DBStats.count('commits')
+
+def _acquire():
+    """Borrow a connection from the pool, opening one if below pool_size."""
+    open_db()
+    with _pool_lock:
+        idle = _idle
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            pass
+        if len(_all_conns) < _pool_size:
+            conn = _connect()
+            _all_conns.append(conn)
+            return conn
+    # Pool is exhausted: wait for another thread to hand a connection back
+    return idle.get()
+
+def _release(conn):
+    """Hand a borrowed connection back to the pool (or close it if the pool was closed)."""
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if _idle is not None and conn in _all_conns:
+            _idle.put(conn)
+            return
+    conn.close()
+
+@contextmanager
+def pooled_connection():
+    """Context manager that borrows a pooled connection for the duration of the block."""
+    conn = _acquire()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+@contextmanager
+def _statement_connection():
+    """Yield (conn, in_transaction) for one statement: the connection of the
+    enclosing transaction() block if there is one, otherwise a pooled connection."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn, True
+    else:
+        with pooled_connection() as conn:
+            yield conn, False
+
+def get_retry_stats() -> dict:
+    """Return counters for the busy-retry path: busy_errors seen, retries made, and
+    operations that gave up (raised DBBusyError)."""
+    with _pool_lock:
+        return dict(_retry_stats)
+
+def _count_retry(name: str):
+    """Bump a retry counter (and mirror it into DBStats when enabled)."""
+    with _pool_lock:
+        _retry_stats[name] += 1
+    if DBStats.enabled:
+        DBStats.count(name)
+
+def _is_busy(e: sqlite3.Error) -> bool:
+    """Return True if e means another connection holds a conflicting lock."""
+    code = getattr(e, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(e).lower()
+    return 'database is locked' in message or 'busy' in message
+
+def _db_error(e: sqlite3.Error, sql: str | None) -> DBError:
+    """Translate a sqlite3 exception into the matching DBError subclass."""
+    if isinstance(e, sqlite3.IntegrityError):
+        return DBIntegrityError(str(e), sql)
+    if _is_busy(e):
+        return DBBusyError(str(e), sql)
+    return DBError(str(e), sql)
+
+def _with_retry(operation, sql: str | None = None):
+    """Call operation() and return its result, retrying with jittered exponential
+    backoff while the database is busy.  operation must leave no partial work
+    behind when it fails (roll back first) so it can safely run again.
+    Raises: DBError (DBBusyError once the retries are used up).
+    """
+    delay = BUSY_BASE_DELAY
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return operation()
+        except sqlite3.Error as e:
+            if not _is_busy(e):
+                raise _db_error(e, sql) from e
+            _count_retry('busy_errors')
+            if attempt == BUSY_RETRIES:
+                _count_retry('gave_up')
+                raise DBBusyError(f"Database stayed locked after {BUSY_RETRIES} retries: {e}", sql) from e
+        _count_retry('retries')
+        time.sleep(random.uniform(0, delay))     # "full jitter" keeps competing writers from retrying in lockstep
+        delay = min(delay * 2, BUSY_MAX_DELAY)
+
+@contextmanager
+def transaction():
+    """Context manager that runs every run_sql/run_sql_many/iter_sql call in the
+    block on one connection and commits them together (rolls back on an exception).
+
+    The write lock is taken up front (BEGIN IMMEDIATE, retried while the database
+    is busy), so a read followed by a write inside the block cannot be
+    interleaved with another writer.  A nested transaction() simply joins the
+    outer one.
+
+    Example:
+        with transaction():
+            row = get_task(task_id)
+            update_task(task_id, task_name=row[3] + " (moved)")
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    with pooled_connection() as conn:
+        _with_retry(lambda: conn.execute("BEGIN IMMEDIATE"), "BEGIN IMMEDIATE")
+        _local.conn = conn
+        try:
+            yield conn
+            try:
+                _commit(conn)
+            except sqlite3.Error as e:
+                raise _db_error(e, "COMMIT") from e
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _local.conn = None
+
+def _execute(conn, sql: str, params, commit: bool):
+    """Run one statement on conn; see run_sql for the return values.
+    When commit is True the change is committed, or rolled back on failure."""
     cursor = conn.cursor()
-    
     try:
         if params:
             cursor.execute(sql, params)
         else:
             cursor.execute(sql)
-        
+
         # If it's a SELECT, fetch results
         if sql.strip().upper().startswith("SELECT"):
-            results = cursor.fetchall()
-        else:
-            conn.commit()
-            # Return lastrowid for INSERT, rowcount for UPDATE/DELETE
-            if sql.strip().upper().startswith("INSERT"):
-                results = cursor.lastrowid
-            else:
-                results = cursor.rowcount
-    except sqlite3.Error as e:
-        results = [("Error", str(e))]
+            return cursor.fetchall()
+        if commit:
+            _commit(conn)
+        # Return lastrowid for INSERT, rowcount for UPDATE/DELETE
+        if sql.strip().upper().startswith("INSERT"):
+            return cursor.lastrowid
+        return cursor.rowcount
+    except sqlite3.Error:
+        if commit:
+            conn.rollback()
+        raise
     finally:
-        conn.close()
-    
-    return results
\ No newline at end of file
+        cursor.close()
+
+def run_sql(sql: str, params=None):
+    """
+    Executes the given SQL statement on a pooled connection to the SQLite
+    database and returns the results (if any).
+
+    Parameters:
+        sql (str): The SQL statement to execute.
+        params (tuple or dict, optional): Parameters for parameterized queries.
+    Returns:
+        For SELECT: list of tuples (query results)
+        For INSERT: lastrowid (int)
+        For UPDATE/DELETE: rowcount (int)
+    Raises:
+        DBBusyError if the database stayed locked after retrying with backoff,
+        DBIntegrityError for constraint violations, DBError for anything else.
+    Inside a transaction() block the change is committed when the block ends,
+    and an error rolls back the whole block.
+    """
+    with _statement_connection() as (conn, in_transaction):
+        start = time.perf_counter() if DBStats.enabled else None
+        try:
+            if in_transaction:
+                # The block already holds the write lock; a retry here would
+                # replay only part of the transaction, so just report the error.
+                try:
+                    return _execute(conn, sql, params, commit=False)
+                except sqlite3.Error as e:
+                    raise _db_error(e, sql) from e
+            return _with_retry(lambda: _execute(conn, sql, params, commit=True), sql)
+        finally:
+            if start is not None:
+                DBStats.record_query(sql, time.perf_counter() - start)
+
+def run_sql_many(sql: str, seq_of_params):
+    """
+    Executes one SQL statement for every parameter set in seq_of_params,
+    all inside a single transaction with one commit.
+
+    Parameters:
+        sql (str): The INSERT/UPDATE/DELETE statement to execute.
+        seq_of_params (iterable): Parameter tuples (or dicts), one per row.
+    Returns:
+        Total rowcount (int)
+    Raises:
+        DBError (or a subclass, see run_sql); nothing is saved.
+    Inside a transaction() block the rows are committed with the rest of the block.
+    """
+    # Materialize generators so a busy retry replays every row, not an exhausted iterator
+    if not isinstance(seq_of_params, (list, tuple)):
+        seq_of_params = list(seq_of_params)
+
+    def execute_many():
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(sql, seq_of_params)
+            if not in_transaction:
+                _commit(conn)
+            return cursor.rowcount
+        except sqlite3.Error:
+            if not in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    with _statement_connection() as (conn, in_transaction):
+        start = time.perf_counter() if DBStats.enabled else None
+        try:
+            if in_transaction:
+                try:
+                    return execute_many()
+                except sqlite3.Error as e:
+                    raise _db_error(e, sql) from e
+            return _with_retry(execute_many, sql)
+        finally:
+            if start is not None:
+                DBStats.record_query(sql, time.perf_counter() - start)
+
+def iter_sql(sql: str, params=None, batch_size: int = 500):
+    """
+    Generator that runs a SELECT and yields its rows one at a time, fetching
+    them from SQLite in batches of batch_size.
+
+    The pooled connection is only held while the generator is being consumed;
+    it is returned to the pool when the rows run out or the generator is closed.
+
+    Parameters:
+        sql (str): The SELECT statement to execute.
+        params (tuple or dict, optional): Parameters for parameterized queries.
+        batch_size (int): Number of rows fetched per round trip.
+    Yields:
+        tuple: one result row
+    Raises:
+        DBError (or a subclass, see run_sql)
+    """
+    with _statement_connection() as (conn, _in_transaction):
+        cursor = conn.cursor()
+        timed = DBStats.enabled
+        elapsed = 0.0       # time spent inside SQLite only, not in the consumer
+        try:
+            start = time.perf_counter()
+            if params:
+                _with_retry(lambda: cursor.execute(sql, params), sql)
+            else:
+                _with_retry(lambda: cursor.execute(sql), sql)
+            while True:
+                try:
+                    rows = cursor.fetchmany(batch_size)
+                except sqlite3.Error as e:
+                    raise _db_error(e, sql) from e
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                yield from rows
+                start = time.perf_counter()
+        finally:
+            cursor.close()
+            if timed:
+                DBStats.record_query(sql, elapsed)
@@ -1,58 +1,127 @@
-"""DBMiddleware - Re-exports CRUD functions from table-specific modules."""
+"""DBMiddleware - Re-exports CRUD functions from table-specific modules and builds the daily task list."""
+from collections import namedtuple
 from datetime import datetime
-from DBMiddleware_tasks import (add_task, update_task, delete_task, get_task, 
-                                list_tasks, toggle_task_active)
+from DBCommands import run_sql, run_sql_many, transaction, ARCHIVE_SCHEMA
+from GenericFunctions import to_db_date
+from DBMiddleware_tasks import (add_task, add_tasks, update_task, delete_task, get_task, 
+                                toggle_task_active)
+from DBMiddleware_tasks import list_tasks as _list_tasks
+from DBMiddleware_task_conflicts import (check_task_times, find_task_conflicts,
+                                         find_all_task_conflicts, find_inverted_tasks)
 from DBMiddleware_house_maintenance_tasks import (get_all_house_maint_tasks, 
                                                   get_house_maint_task_by_date,
+                                                  get_house_maint_rotation,
+                                                  get_house_maint_schedule,
                                                   add_house_maint_task, 
+                                                  add_house_maint_tasks,
                                                   update_house_maint_task,
                                                   delete_house_maint_task, 
                                                   get_house_maint_task)
-from DBMiddleware_end_of_day_notes import (add_note, get_note, update_note, 
-                                            delete_note, list_notes, 
-                                            list_notes_by_date, get_todays_note, get_yestedays_note)
-
-def list_tasks_with_today_house_maint():
-    """Return all tasks ordered by FromTime, with today's house maintenance task injected."""
-    tasks = list_tasks()
-    
-    # Get today's date in MM/DD/YY format
-    today = datetime.now().strftime('%m/%d/%y')
-    house_task = get_house_maint_task_by_date(today)
-    
-    # Find and update the "House Maintenance Task" entry
-    updated_tasks = []
-    for task in tasks:
-        tid, fr, to, name, active = task
-        if "House Maintenance Task" in name:
-            # Replace with today's specific house maintenance task
-            updated_tasks.append((tid, fr, to, house_task, active))
-        else:
-            updated_tasks.append(task)
-    
-    return updated_tasks
-
-# Override list_tasks to include today's house maintenance task
-_original_list_tasks = list_tasks
-
-def list_tasks():
-    """Return all tasks ordered by FromTime, with today's house maintenance task injected."""
-    tasks = _original_list_tasks()
-    
-    # Get today's date in MM/DD/YY format
-    today = datetime.now().strftime('%m/%d/%y')
-    house_task = get_house_maint_task_by_date(today)
-    
-    # Find and update the "House Maintenance Task" entry
-    updated_tasks = []
-    for task in tasks:
-        tid, fr, to, name, active = task
-        if "House Maintenance Task" in name:
-            # Replace with today's specific house maintenance task
-            updated_tasks.append((tid, fr, to, house_task, active))
-        else:
-            updated_tasks.append(task)
-    
-    return updated_tasks
+from DBMiddleware_end_of_day_notes import (add_note, add_notes, get_note, update_note, 
+                                            delete_note, list_notes, list_notes_page, search_notes,
+                                            list_notes_by_date, list_notes_between, list_notes_for_working_days,
+                                            get_todays_note, get_yestedays_note)
 
+# Placeholder task name whose slot is filled by the day's house maintenance task
+HOUSE_MAINT_SLOT = "House Maintenance Task"
 
+# Result of get_daily_plan:
+# - date: the plan's day (YYYY-MM-DD)
+# - tasks: (id, FromTime, ToTime, TaskName, Active) rows, as list_plan_tasks returns them
+# - notes: (id, note, DateAdded) rows from the previous working day
+DailyPlan = namedtuple('DailyPlan', ['date', 'tasks', 'notes'])
+
+# Materialized plans older than this many days are pruned when a plan is built
+DAILY_PLAN_KEEP_DAYS = 7
+
+def list_tasks(date=None, active_only: bool = False):
+    """Return tasks ordered by FromTime, with the house maintenance task for `date` injected.
+    Inputs:
+    - date: date/datetime or MM/DD/YY string (default today)
+    - active_only: only return active tasks
+    Only the house maintenance slot row is replaced; every other row is returned as fetched.
+    """
+    rows = _list_tasks(active_only)
+    house_task = None
+    for i, (tid, fr, to, name, active) in enumerate(rows):
+        if HOUSE_MAINT_SLOT in name:
+            if house_task is None:      # look the rotation up only if the slot is scheduled
+                house_task = get_house_maint_task_by_date(date or datetime.now())
+            rows[i] = (tid, fr, to, house_task, active)
+    return rows
+
+def list_plan_tasks(date=None):
+    """Return the active tasks for `date` (default today) with the house maintenance task injected."""
+    return list_tasks(date, active_only=True)
+
+# Kept for callers written against the old name
+list_tasks_with_today_house_maint = list_tasks
+
+# Sum of the table_versions counters in MorningRoutine.db and the notes archive
+_ROUTINE_VERSION_SQL = f"""(SELECT COALESCE(SUM(version), 0) FROM main.table_versions)
+                           + (SELECT COALESCE(SUM(version), 0) FROM {ARCHIVE_SCHEMA}.table_versions)"""
+
+def get_routine_version() -> int:
+    """Return a counter that goes up on every change to tasks, house maintenance
+    tasks or notes, archived notes included (the sum of the table_versions counters)."""
+    return run_sql(f"SELECT {_ROUTINE_VERSION_SQL}")[0][0]
+
+def _read_daily_plan(plan_date: str):
+    """Return the stored plan for plan_date, or None if it is missing or stale."""
+    # One indexed read: the freshness check (see get_routine_version) rides along on every row
+    rows = run_sql(f"""SELECT m.Version = ({_ROUTINE_VERSION_SQL}),
+                             p.Kind, p.RefId, p.FromTime, p.ToTime, p.Text, p.NoteDate
+                      FROM daily_plan_meta m
+                      LEFT JOIN daily_plan p ON p.PlanDate = m.PlanDate
+                      WHERE m.PlanDate = ?
+                      ORDER BY p.Position""", (plan_date,))
+    if not rows or not rows[0][0]:
+        return None
+    tasks, notes = [], []
+    for _, kind, ref_id, fr, to, text, note_date in rows:
+        if kind == 'task':
+            tasks.append((ref_id, fr, to, text, 1))
+        elif kind == 'note':
+            notes.append((ref_id, text, note_date))
+    return DailyPlan(plan_date, tasks, notes)
+
+def _resolve_daily_plan(plan_date: str) -> DailyPlan:
+    """Resolve the plan for plan_date from the source tables."""
+    return DailyPlan(plan_date, list_plan_tasks(plan_date), get_yestedays_note(plan_date))
+
+def _build_daily_plan(plan_date: str) -> DailyPlan:
+    """Resolve the plan for plan_date from the source tables and store it."""
+    with transaction():
+        # Another session may have built it while we waited for the write lock
+        plan = _read_daily_plan(plan_date)
+        if plan is not None:
+            return plan
+        version = get_routine_version()
+        plan = _resolve_daily_plan(plan_date)
+        rows = [(plan_date, i, 'task', tid, fr, to, name, None)
+                for i, (tid, fr, to, name, _) in enumerate(plan.tasks)]
+        rows += [(plan_date, len(rows) + i, 'note', note_id, None, None, note, date_added)
+                 for i, (note_id, note, date_added) in enumerate(plan.notes)]
+        # Relative to today, so storing some other day's plan can't evict today's
+        oldest = to_db_date(datetime.now().toordinal() - DAILY_PLAN_KEEP_DAYS)
+        run_sql("DELETE FROM daily_plan WHERE PlanDate = ? OR PlanDate < ?", (plan_date, oldest))
+        run_sql("DELETE FROM daily_plan_meta WHERE PlanDate = ? OR PlanDate < ?", (plan_date, oldest))
+        if rows:
+            run_sql_many("""INSERT INTO daily_plan (PlanDate, Position, Kind, RefId, FromTime, ToTime, Text, NoteDate)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+        run_sql("INSERT INTO daily_plan_meta (PlanDate, Version, BuiltAt) VALUES (?, ?, ?)",
+                (plan_date, version, datetime.now().isoformat(timespec='seconds')))
+    return plan
+
+def get_daily_plan(date=None) -> DailyPlan:
+    """Return the plan for `date` (default today): active tasks with the house
+    maintenance task filled in, plus the previous working day's notes.
+    The resolved plan is stored in daily_plan and served from there until a
+    write to tasks, house_maintenance_tasks or end_of_day_notes (or the archived
+    notes) makes it stale, so polling it costs one indexed read.  Only today's plan is stored; other days are resolved on each
+    call, so asking about an arbitrary date never writes to the database.
+    """
+    plan_date = to_db_date(date)
+    if plan_date != to_db_date():
+        return _read_daily_plan(plan_date) or _resolve_daily_plan(plan_date)
+    return _read_daily_plan(plan_date) or _build_daily_plan(plan_date)
@@ -1,6 +1,21 @@
-"""CRUD operations for the End of Day Notes table."""
-from DBCommands import run_sql
-from datetime import datetime, timedelta
+"""CRUD operations for the End of Day Notes table.
+
+Notes older than the archive age live in the attached archive database
+(see DBArchive).  Reads cover both tables through union_note_tables() (also
+used by DBTransfer's export); new notes always go into the hot table.
+"""
+from DBCommands import run_sql, run_sql_many, iter_sql, ARCHIVE_SCHEMA
+from BusinessCalendar import last_working_days
+from GenericFunctions import to_db_date, to_day_number
+
+_NOTE_TABLES = ('main.end_of_day_notes', f'{ARCHIVE_SCHEMA}.end_of_day_notes')
+
+def union_note_tables(select_sql: str) -> str:
+    """Return select_sql (with a {notes} placeholder for the table) run on the hot
+    and the archive table and combined with UNION ALL.  Parameters have to be
+    passed once per table.  With an ORDER BY on the result SQLite merges the two
+    index-ordered scans instead of sorting."""
+    return " UNION ALL ".join(select_sql.format(notes=table) for table in _NOTE_TABLES)
 
 def add_note(note: str) -> int:
     """Insert a new end of day note.
@@ -10,61 +25,152 @@ def add_note(note: str) -> int:
     """
     if not note or not note.strip():
         raise ValueError("Note cannot be blank.")
-    today = datetime.now().strftime('%Y-%m-%d')
     sql = "INSERT INTO end_of_day_notes (note, DateAdded) VALUES (?, ?)"
-    new_id = run_sql(sql, (note.strip(), today))
+    new_id = run_sql(sql, (note.strip(), to_db_date()))
     return new_id
 
+def add_notes(rows) -> int:
+    """Insert many end of day notes in a single transaction.
+    Inputs:
+    - rows: iterable of note strings (dated today) or (note, date) tuples, the date as
+      YYYY-MM-DD, MM/DD/YY or a date object
+    Returns: number of rows inserted (int)
+    Raises ValueError (and saves nothing) if any note is blank.
+    """
+    today = to_db_date()
+
+    def params():
+        for row in rows:
+            note, date_added = (row, today) if isinstance(row, str) else (row[0], to_db_date(row[1]))
+            if not note or not note.strip():
+                raise ValueError("Note cannot be blank.")
+            yield (note.strip(), date_added)
+
+    sql = "INSERT INTO end_of_day_notes (note, DateAdded) VALUES (?, ?)"
+    return run_sql_many(sql, params())
+
 def get_note(note_id: int):
-    """Return a single note row by id or None if not found."""
-    sql = "SELECT * FROM end_of_day_notes WHERE id = ?"
-    results = run_sql(sql, (note_id,))
+    """Return a single note row (hot or archived) by id or None if not found."""
+    sql = union_note_tables("SELECT id, note, DateAdded FROM {notes} WHERE id = ?")
+    results = run_sql(sql, (note_id, note_id))
     return results[0] if results else None
 
 def update_note(note_id: int, note: str) -> int:
     """Update a note's text. Returns rows affected (0 if id not found)."""
     if not note or not note.strip():
         raise ValueError("Note cannot be blank.")
-    sql = "UPDATE end_of_day_notes SET note = ? WHERE id = ?"
-    count = run_sql(sql, (note.strip(), note_id))
+    for table in _NOTE_TABLES:
+        count = run_sql(f"UPDATE {table} SET note = ? WHERE id = ?", (note.strip(), note_id))
+        if count:
+            break
     return count
 
 def delete_note(note_id: int) -> int:
     """Delete a note by id. Returns rows affected (0 if id not found)."""
-    sql = "DELETE FROM end_of_day_notes WHERE id = ?"
-    count = run_sql(sql, (note_id,))
+    for table in _NOTE_TABLES:
+        count = run_sql(f"DELETE FROM {table} WHERE id = ?", (note_id,))
+        if count:
+            break
     return count
 
 def list_notes():
-    """Return all notes ordered by DateAdded (newest first)."""
-    sql = "SELECT id, note, DateAdded FROM end_of_day_notes ORDER BY DateAdded DESC, id DESC"
-    return run_sql(sql)
+    """Return an iterator over all notes, archived ones included, ordered by DateAdded (newest first).
+    Rows are streamed from the database, so memory use does not grow with the table."""
+    sql = union_note_tables("SELECT id, note, DateAdded FROM {notes}") + " ORDER BY DateAdded DESC, id DESC"
+    return iter_sql(sql)
+
+def list_notes_page(after=None, before=None, limit: int = 20):
+    """Return one page of notes ordered by DateAdded (newest first) using keyset pagination.
+    Inputs:
+    - after: (DateAdded, id) of the last row of the current page -> returns the next (older) page
+    - before: (DateAdded, id) of the first row of the current page -> returns the previous (newer) page
+    - limit: maximum number of rows in the page
+    With neither key, returns the first (newest) page.
+    Returns: list of (id, note, DateAdded) tuples, newest first.
+    """
+    # Seek directly to the key instead of using OFFSET, so each page only
+    # touches `limit` rows no matter how deep into the history it is.
+    if after is not None:
+        sql = (union_note_tables("SELECT id, note, DateAdded FROM {notes} WHERE (DateAdded, id) < (?, ?)")
+               + " ORDER BY DateAdded DESC, id DESC LIMIT ?")
+        return run_sql(sql, (after[0], after[1]) * 2 + (limit,))
+    if before is not None:
+        sql = (union_note_tables("SELECT id, note, DateAdded FROM {notes} WHERE (DateAdded, id) > (?, ?)")
+               + " ORDER BY DateAdded ASC, id ASC LIMIT ?")
+        rows = run_sql(sql, (before[0], before[1]) * 2 + (limit,))
+        rows.reverse()
+        return rows
+    sql = union_note_tables("SELECT id, note, DateAdded FROM {notes}") + " ORDER BY DateAdded DESC, id DESC LIMIT ?"
+    return run_sql(sql, (limit,))
+
+def search_notes(query: str, limit: int = 20):
+    """Full-text search of all notes, archived ones included (e.g. for a stock symbol).
+    Inputs:
+    - query: words that must all appear in the note; end a word with * to match a prefix (e.g. AAP*)
+    - limit: maximum number of rows returned
+    Returns: list of (id, note, DateAdded) tuples, best matches first.
+    """
+    terms = query.split() if query else []
+    if not terms:
+        raise ValueError("Search text cannot be blank.")
+    # Quote every word so punctuation in the user's text can't be read as FTS5 syntax
+    match = " ".join(
+        '"' + term.rstrip('*').replace('"', '""') + '"' + ('*' if term.endswith('*') else '')
+        for term in terms
+    )
+    # Each database has its own full-text index; bm25 ranks from the two are merged as-is
+    matches = " UNION ALL ".join(
+        f"""SELECT n.id, n.note, n.DateAdded, f.rank
+            FROM {schema}.end_of_day_notes_fts f
+            JOIN {schema}.end_of_day_notes n ON n.id = f.rowid
+            WHERE f.end_of_day_notes_fts MATCH ?"""
+        for schema in ('main', ARCHIVE_SCHEMA)
+    )
+    sql = f"SELECT id, note, DateAdded FROM ({matches}) ORDER BY rank LIMIT ?"
+    return run_sql(sql, (match, match, limit))
 
 def list_notes_by_date(date_str: str):
-    """Return all notes for a specific date (YYYY-MM-DD format)."""
-    sql = "SELECT id, note, DateAdded FROM end_of_day_notes WHERE DateAdded = ? ORDER BY id DESC"
-    return run_sql(sql, (date_str,))
+    """Return all notes for a specific date (YYYY-MM-DD format; MM/DD/YY or a date also work)."""
+    date_str = to_db_date(date_str)
+    sql = union_note_tables("SELECT id, note, DateAdded FROM {notes} WHERE DateAdded = ?") + " ORDER BY id DESC"
+    return run_sql(sql, (date_str, date_str))
+
+def list_notes_between(start, end):
+    """Return notes dated from start to end inclusive, archived ones included, newest first.
+    Inputs:
+    - start, end: dates as YYYY-MM-DD or MM/DD/YY strings, date objects or day numbers
+    Returns: list of (id, note, DateAdded) tuples.
+    Runs as an index range scan on the integer DayNumber column.
+    """
+    first, last = to_day_number(start), to_day_number(end)
+    if first > last:
+        raise ValueError("The start date must not be after the end date.")
+    # DayNumber is selected only so the merged ORDER BY can use the index
+    sql = (union_note_tables("SELECT id, note, DateAdded, DayNumber FROM {notes} WHERE DayNumber BETWEEN ? AND ?")
+           + " ORDER BY DayNumber DESC, id DESC")
+    return [row[:3] for row in run_sql(sql, (first, last) * 2)]
 
 def get_todays_note():
     """Return all notes for today."""
-    today = datetime.now().strftime('%Y-%m-%d')
-    return list_notes_by_date(today)
-
-def get_yestedays_note():
-    """Return all notes for yesterday, skipping weekends.
-    If today is Monday, returns Friday's notes.
-    If today is Sunday, returns Friday's notes.
-    Otherwise returns yesterday's notes.
+    return list_notes_by_date(to_db_date())
+
+def list_notes_for_working_days(days: int = 1, before=None):
+    """Return notes from the last `days` working days before `before` (default today), newest first.
+    Working days come from BusinessCalendar (configured weekend and holidays);
+    all of them are fetched with a single DateAdded IN (...) query.
+    """
+    if days < 1:
+        raise ValueError("days must be at least 1.")
+    dates = [d.isoformat() for d in last_working_days(days, before)]
+    sql = (union_note_tables(f"SELECT id, note, DateAdded FROM {{notes}} WHERE DateAdded IN ({', '.join('?' for _ in dates)})")
+           + " ORDER BY DateAdded DESC, id DESC")
+    return run_sql(sql, tuple(dates) * 2)
+
+def get_yestedays_note(day=None):
+    """Return all notes for the previous working day.
+    Skips weekends and the holidays in the calendar's holiday file, so on a
+    Monday (or the Tuesday after a Monday holiday) this is Friday's notes.
+    Inputs:
+    - day: date to look back from (date, datetime or MM/DD/YY string; default today)
     """
-    today = datetime.now()
-    weekday = today.weekday()  # Monday=0, Sunday=6
-    
-    if weekday == 0:  # Monday - get Friday (3 days back)
-        target_date = today - timedelta(days=3)
-    elif weekday == 6:  # Sunday - get Friday (2 days back)
-        target_date = today - timedelta(days=2)
-    else:  # Tuesday-Saturday - get yesterday (1 day back)
-        target_date = today - timedelta(days=1)
-    
-    target_date_str = target_date.strftime('%Y-%m-%d')
-    return list_notes_by_date(target_date_str)
+    return list_notes_for_working_days(1, day)
@@ -1,8 +1,47 @@
 """CRUD operations for the house_maintenance_tasks table."""
-from DBCommands import run_sql
-from GenericFunctions import parse_date
+from array import array
+from collections import namedtuple
+from DBCommands import run_sql, run_sql_many, data_version, in_transaction, on_db_reset
+from GenericFunctions import to_date
 from datetime import datetime
 
+# Result of get_house_maint_schedule: parallel arrays, one entry per day.
+# - ordinals: date ordinals (datetime.date.fromordinal turns one back into a date)
+# - indices: index into `tasks` for that day (-1 when no tasks exist)
+# - tasks: the rotation the indices refer to
+HouseMaintSchedule = namedtuple('HouseMaintSchedule', ['ordinals', 'indices', 'tasks'])
+
+# In-process cache of the rotation (task names ordered by id) and the
+# data_version it was read at.  Writes in this module clear it directly;
+# data_version catches writes made by other processes.
+_rotation_cache = None
+_rotation_version = None
+
+def invalidate_house_maint_cache():
+    """Drop the cached rotation so the next lookup re-reads the table."""
+    global _rotation_cache
+    _rotation_cache = None
+
+on_db_reset(invalidate_house_maint_cache)
+
+def get_house_maint_rotation() -> tuple:
+    """Return all house maintenance task names ordered by id (the cycling order).
+    Served from an in-process cache that is refreshed only when the database has changed.
+    """
+    global _rotation_cache, _rotation_version
+    if in_transaction():
+        # May see rows that are later rolled back (which data_version won't report),
+        # so read the table without caching the result
+        results = run_sql("SELECT task_name FROM house_maintenance_tasks ORDER BY id")
+        return tuple(row[0] for row in results)
+    version = data_version()        # read before the query so a concurrent write is never missed
+    rotation = _rotation_cache
+    if rotation is None or version != _rotation_version:
+        results = run_sql("SELECT task_name FROM house_maintenance_tasks ORDER BY id") # Ordered by id for deterministic cycling
+        rotation = tuple(row[0] for row in results)
+        _rotation_cache, _rotation_version = rotation, version
+    return rotation
+
 def get_all_house_maint_tasks():
     """Retrieve and display all tasks from the house_maintenance_tasks table using SELECT *.
     Returns:
@@ -12,23 +51,21 @@ def get_all_house_maint_tasks():
     tasks = run_sql("SELECT * FROM house_maintenance_tasks")
     return tasks
 
-def get_house_maint_task_by_date(date_str: str) -> str:
+def get_house_maint_task_by_date(date_str) -> str:
     """Return the task name for a given date by cycling through tasks.
     Inputs:
-    - date_str: a date string in MM/DD/YY format.
+    - date_str: a date string in MM/DD/YY format (a date or datetime is also accepted).
     Behavior:
-    - Reads all task names from the SQLite DB table `house_maintenance_tasks`.
+    - Reads all task names from the cached `house_maintenance_tasks` rotation.
     - Uses the date's ordinal number to compute an index into the task list, cycling with modulo.
     Returns:
     - The selected task name, or a fallback message if no tasks exist.
     """
     # Convert string to date
-    date = parse_date(date_str)
+    date = to_date(date_str)
     
-    # Connect to the SQLite database located in the current project directory.
-    # Note: `Setup.py` initializes and populates this database.
-    results = run_sql("SELECT task_name FROM house_maintenance_tasks ORDER BY id") # Get all tasks ordered by their id for deterministic cycling
-    tasks = [row[0] for row in results]
+    # Note: `Setup.py` initializes and populates this table.
+    tasks = get_house_maint_rotation()
 
     if not tasks:
         return "No tasks available."
@@ -37,6 +74,30 @@ def get_house_maint_task_by_date(date_str: str) -> str:
     index = (day_number - 1) % len(tasks)       # Use modulo to cycle through tasks across days
     return tasks[index]
 
+def get_house_maint_schedule(start_date, days: int) -> HouseMaintSchedule:
+    """Return the house maintenance rotation for `days` consecutive days in one call.
+    Inputs:
+    - start_date: first day, as a date/datetime or MM/DD/YY string
+    - days: number of days to compute
+    Returns:
+    - HouseMaintSchedule of parallel arrays; day i is date.fromordinal(ordinals[i])
+      and its task is tasks[indices[i]].
+    """
+    first = to_date(start_date).toordinal()
+    tasks = get_house_maint_rotation()      # one (cached) read for the whole range
+    days = max(0, days)
+    ordinals = array('i', range(first, first + days))
+    if not tasks:
+        return HouseMaintSchedule(ordinals, array('i', [-1]) * days, tasks)
+
+    # Same formula as get_house_maint_task_by_date, (ordinal - 1) % len(tasks).
+    # The indices repeat every len(tasks) days, so compute one full cycle and
+    # let array repetition build the rest of the range in C.
+    n = len(tasks)
+    cycle = array('i', [(first - 1 + k) % n for k in range(n)])
+    indices = (cycle * (days // n + 1))[:days]
+    return HouseMaintSchedule(ordinals, indices, tasks)
+
 def add_house_maint_task(task_name: str) -> int:
     """Insert a new task into the house_maintenance_tasks table.
     Returns: new task id (int)"""
@@ -44,19 +105,32 @@ def add_house_maint_task(task_name: str) -> int:
         "INSERT INTO house_maintenance_tasks (task_name) VALUES (?)",
         (task_name,)
     )
+    invalidate_house_maint_cache()
     return new_id
 
+def add_house_maint_tasks(task_names) -> int:
+    """Insert many house maintenance tasks in a single transaction.
+    Returns: number of rows inserted (int)"""
+    count = run_sql_many(
+        "INSERT INTO house_maintenance_tasks (task_name) VALUES (?)",
+        ((task_name,) for task_name in task_names)
+    )
+    invalidate_house_maint_cache()
+    return count
+
 def update_house_maint_task(task_id: int, task_name: str) -> int:
     """Update a house maintenance task name. Returns rows affected."""
     count = run_sql(
         "UPDATE house_maintenance_tasks SET task_name = ? WHERE id = ?",
         (task_name, task_id)
     )
+    invalidate_house_maint_cache()
     return count
 
 def delete_house_maint_task(task_id: int) -> int:
     """Delete a house maintenance task by id. Returns rows affected."""
     count = run_sql("DELETE FROM house_maintenance_tasks WHERE id = ?", (task_id,))
+    invalidate_house_maint_cache()
     return count
 
 def get_house_maint_task(task_id: int):
@@ -0,0 +1,174 @@
+"""Schedule conflict detection for the tasks table.
+
+Active tasks are kept in an in-process interval index sorted by start time.
+Looking up what overlaps a time slot only has to look at tasks that start
+within the longest task's length before the slot, and the all-overlaps
+report is a single sweep over the sorted tasks, so neither compares every
+pair of tasks.
+
+Times are HH:MM on one day; a slot covers [FromTime, ToTime), so 09:00-09:30
+and 09:30-10:00 do not conflict.  A slot whose ToTime is not after its
+FromTime is inverted and reported by check_task_times / find_inverted_tasks.
+"""
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from DBCommands import run_sql, get_table_version, in_transaction, on_db_reset
+
+def _minutes(hhmm: str) -> int:
+    """Convert HH:MM to minutes after midnight."""
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+class TaskIntervalIndex:
+    """Active tasks as intervals sorted by (start, id).
+    Each task row is (id, FromTime, ToTime, TaskName); inverted rows are not indexed.
+    """
+
+    def __init__(self, rows=()):
+        self._keys = []         # sorted (start, id)
+        self._rows = {}         # id -> (start, end, row)
+        self._max_length = 0    # longest indexed interval, in minutes
+        for row in rows:
+            start, end = _minutes(row[1]), _minutes(row[2])
+            if end > start:
+                self._rows[row[0]] = (start, end, row)
+                self._max_length = max(self._max_length, end - start)
+        self._keys = sorted((start, task_id) for task_id, (start, _, _) in self._rows.items())
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row):
+        """Index a task row, replacing any earlier entry for the same id."""
+        task_id = row[0]
+        self.remove(task_id)
+        start, end = _minutes(row[1]), _minutes(row[2])
+        if end <= start:
+            return
+        insort(self._keys, (start, task_id))
+        self._rows[task_id] = (start, end, row)
+        self._max_length = max(self._max_length, end - start)
+
+    def remove(self, task_id: int):
+        """Drop a task from the index (no-op if it isn't there)."""
+        entry = self._rows.pop(task_id, None)
+        if entry is None:
+            return
+        start, end, _ = entry
+        del self._keys[bisect_left(self._keys, (start, task_id))]
+        if end - start == self._max_length:
+            # The longest interval went away; the bound only has to stay an upper bound,
+            # but a tight one keeps the search window small
+            self._max_length = max((e - s for s, e, _ in self._rows.values()), default=0)
+
+    def overlapping(self, start: int, end: int, exclude_id: int | None = None) -> list:
+        """Return the rows overlapping [start, end) minutes, ordered by start time."""
+        # Anything that starts at or before start - max_length has ended by start
+        lo = bisect_right(self._keys, (start - self._max_length, float('inf')))
+        hi = bisect_left(self._keys, (end, -1))
+        found = []
+        for _, task_id in self._keys[lo:hi]:
+            task_start, task_end, row = self._rows[task_id]
+            if task_end > start and task_id != exclude_id:
+                found.append(row)
+        return found
+
+    def all_overlaps(self) -> list:
+        """Return every overlapping pair (earlier row, later row) in one sweep.
+        O(n log n + k) for k overlapping pairs: a heap holds the tasks still
+        running at each start time.
+        """
+        pairs = []
+        running = []        # heap of (end, start, id) for tasks not yet finished
+        for start, task_id in self._keys:
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            row = self._rows[task_id][2]
+            for _, _, other_id in running:
+                pairs.append((self._rows[other_id][2], row))
+            heapq.heappush(running, (self._rows[task_id][1], start, task_id))
+        return pairs
+
+# In-process index and the tasks table_version it reflects.  Writes through
+# DBMiddleware_tasks update it in place; any other change to the table
+# (another process, a bulk import) shows up as a version mismatch and the
+# index is rebuilt on the next lookup.
+_index = None
+_index_version = None
+_lock = threading.Lock()     # DBAsync readers may query while the writer thread updates the index
+
+def _load_row(task_id: int):
+    results = run_sql("SELECT id, FromTime, ToTime, TaskName FROM tasks WHERE id = ? AND Active = 1", (task_id,))
+    return results[0] if results else None
+
+def get_task_interval_index() -> TaskIntervalIndex:
+    """Return the interval index of active tasks, rebuilding it if the table has changed."""
+    global _index, _index_version
+    version = get_table_version('tasks')    # read before the query so a concurrent write is never missed
+    index = _index
+    if index is None or version != _index_version:
+        index = TaskIntervalIndex(run_sql(
+            "SELECT id, FromTime, ToTime, TaskName FROM tasks WHERE Active = 1 ORDER BY FromTime"))
+        with _lock:
+            _index, _index_version = index, version
+    return index
+
+def invalidate_task_index():
+    """Drop the interval index so the next lookup rebuilds it."""
+    global _index
+    _index = None
+
+on_db_reset(invalidate_task_index)
+
+def task_written(task_id: int, rows_changed: int):
+    """Bring the index up to date after DBMiddleware_tasks changed one task.
+    Only re-reads that task, unless something else also changed the table
+    (or the write is inside a transaction that may still roll back).
+    """
+    global _index_version
+    if _index is None or not rows_changed:
+        return
+    if in_transaction():
+        invalidate_task_index()
+        return
+    version = get_table_version('tasks')
+    if version != _index_version + rows_changed:
+        invalidate_task_index()
+        return
+    row = _load_row(task_id)
+    with _lock:
+        if _index is None:
+            return
+        if row is None:
+            _index.remove(task_id)
+        else:
+            _index.add(row)
+        _index_version = version
+
+def check_task_times(from_time: str, to_time: str):
+    """Raise ValueError if the slot is inverted (ToTime not after FromTime)."""
+    if _minutes(to_time) <= _minutes(from_time):
+        raise ValueError(f"End time {to_time} must be after start time {from_time}.")
+
+def find_task_conflicts(from_time: str, to_time: str, exclude_id: int | None = None) -> list:
+    """Return active tasks overlapping a time slot.
+    Inputs:
+    - from_time, to_time: the slot in HH:MM format
+    - exclude_id: task to ignore, e.g. the one being edited
+    Returns: list of (id, FromTime, ToTime, TaskName) ordered by start time
+    """
+    check_task_times(from_time, to_time)
+    index = get_task_interval_index()
+    with _lock:
+        return index.overlapping(_minutes(from_time), _minutes(to_time), exclude_id)
+
+def find_all_task_conflicts() -> list:
+    """Return every pair of overlapping active tasks as (earlier row, later row)."""
+    index = get_task_interval_index()
+    with _lock:
+        return index.all_overlaps()
+
+def find_inverted_tasks() -> list:
+    """Return active tasks whose ToTime is not after their FromTime."""
+    return run_sql("SELECT id, FromTime, ToTime, TaskName FROM tasks WHERE Active = 1 AND ToTime <= FromTime ORDER BY FromTime")
@@ -1,5 +1,6 @@
 """CRUD operations for the tasks table."""
-from DBCommands import run_sql
+from DBCommands import run_sql, run_sql_many
+from DBMiddleware_task_conflicts import task_written, invalidate_task_index
 
 def add_task(from_time: str, to_time: str, task_name: str, active: bool = True) -> int:
     """Insert a new task into the tasks table.
@@ -15,8 +16,26 @@ def add_task(from_time: str, to_time: str, task_name: str, active: bool = True)
         sql,
         (from_time, to_time, task_name, 1 if active else 0)
     )
+    task_written(new_id, 1)
     return new_id
 
+def add_tasks(rows) -> int:
+    """Insert many tasks in a single transaction.
+    Inputs:
+    - rows: iterable of (from_time, to_time, task_name) or (from_time, to_time, task_name, active)
+    Returns: number of rows inserted (int)
+    """
+    def params():
+        for row in rows:
+            from_time, to_time, task_name = row[:3]
+            active = row[3] if len(row) > 3 else True
+            yield (from_time, to_time, task_name, 1 if active else 0)
+
+    sql = "INSERT INTO tasks (FromTime, ToTime, TaskName, Active) VALUES (?, ?, ?, ?)"
+    count = run_sql_many(sql, params())
+    invalidate_task_index()
+    return count
+
 def update_task(task_id: int, from_time: str | None = None, to_time: str | None = None,
                 task_name: str | None = None, active: bool | None = None) -> int:
     """Update fields of an existing task by id.
@@ -43,12 +62,14 @@ def update_task(task_id: int, from_time: str | None = None, to_time: str | None
     
     sql = f"UPDATE tasks SET {', '.join(fields)} WHERE id = ?"
     count = run_sql(sql, tuple(values))
+    task_written(task_id, count)
     return count
 
 def delete_task(task_id: int) -> int:
     """Delete a task by id. Returns number of rows deleted (0 if none)."""
     sql = "DELETE FROM tasks WHERE id = ?"
     count = run_sql(sql, (task_id,))
+    task_written(task_id, count)
     return count
 
 def get_task(task_id: int):
@@ -57,17 +78,18 @@ def get_task(task_id: int):
     results = run_sql(sql, (task_id,))
     return results[0] if results else None
 
-def list_tasks():
-    """Return all tasks ordered by FromTime."""
-    sql = "SELECT id, FromTime, ToTime, TaskName, Active FROM tasks ORDER BY FromTime"
+def list_tasks(active_only: bool = False):
+    """Return all tasks ordered by FromTime (only active tasks if active_only is True)."""
+    if active_only:
+        sql = "SELECT id, FromTime, ToTime, TaskName, Active FROM tasks WHERE Active = 1 ORDER BY FromTime"
+    else:
+        sql = "SELECT id, FromTime, ToTime, TaskName, Active FROM tasks ORDER BY FromTime"
     return run_sql(sql)
 
 def toggle_task_active(task_id: int) -> int:
     """Invert the Active flag for a task. Returns rows affected (0 if id not found)."""
-    row = get_task(task_id)
-    if not row:
-        return 0
-    # row structure: (id, FromTime, ToTime, TaskName, Active)
-    current_active = row[4]
-    new_active = 0 if current_active else 1
-    return update_task(task_id, active=bool(new_active))
+    # Single atomic statement: no read-then-write window for another session to slip into
+    sql = "UPDATE tasks SET Active = NOT Active WHERE id = ?"
+    count = run_sql(sql, (task_id,))
+    task_written(task_id, count)
+    return count
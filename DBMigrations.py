@@ -0,0 +1,272 @@
+"""Versioned schema migrations for MorningRoutine.db.
+
+The database's PRAGMA user_version records the last migration applied, so
+migrate() only runs the steps an existing database is missing and never
+touches the data already in it.
+"""
+
+def _change_log_triggers(table: str, columns: tuple, when: str | None = None) -> list:
+    """Return the insert/update/delete triggers that record changes to table in change_log
+    (only while the condition `when` holds, if given)."""
+    def row_json(ref):
+        return "json_object(" + ", ".join(f"'{c}', {ref}.{c}" for c in columns) + ")"
+    origin = "(SELECT apply_origin FROM sync_node)"
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    condition = f" WHEN {when}" if when else ""
+    triggers = []
+    for suffix, event, op, ref, data in (('ai', 'INSERT', 'I', 'new', row_json('new')),
+                                         ('au', 'UPDATE', 'U', 'new', row_json('new')),
+                                         ('ad', 'DELETE', 'D', 'old', 'NULL')):
+        triggers.append(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_change_{suffix} AFTER {event} ON {table}{condition} BEGIN
+                   INSERT INTO change_log (table_name, row_id, op, row_data, changed_at, origin)
+                   VALUES ('{table}', {ref}.id, '{op}', {data}, {now}, {origin});
+               END""")
+    return triggers
+
+def _drop_change_log_triggers(table: str) -> list:
+    return [f"DROP TRIGGER IF EXISTS {table}_change_{suffix}" for suffix in ('ai', 'au', 'ad')]
+
+# Ordered list of (version, description, statements).  Append new steps at the
+# end with the next version number; never edit a step that has shipped.
+MIGRATIONS = [
+    (1, "Create base tables", [
+        '''CREATE TABLE IF NOT EXISTS house_maintenance_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_name TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            FromTime TIME NOT NULL,
+            ToTime TIME NOT NULL,
+            TaskName TEXT NOT NULL,
+            Active BOOLEAN NOT NULL DEFAULT 1
+        )''',
+        '''CREATE TABLE IF NOT EXISTS end_of_day_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note TEXT NOT NULL,
+            DateAdded DATE NOT NULL
+        )''',
+    ]),
+    (2, "Index notes by date and tasks by start time", [
+        # Serves list_notes_by_date (WHERE DateAdded = ?) as well as the
+        # (DateAdded, id) ordering used by list_notes and list_notes_page.
+        "CREATE INDEX IF NOT EXISTS idx_end_of_day_notes_date_id ON end_of_day_notes (DateAdded, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_from_time ON tasks (FromTime)",
+    ]),
+    (3, "Full-text search index over end_of_day_notes", [
+        # External-content FTS5 table: stores only the index, the text stays
+        # in end_of_day_notes.  The triggers keep the two in step.
+        """CREATE VIRTUAL TABLE IF NOT EXISTS end_of_day_notes_fts
+           USING fts5(note, content='end_of_day_notes', content_rowid='id')""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_ai AFTER INSERT ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (rowid, note) VALUES (new.id, new.note);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_ad AFTER DELETE ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (end_of_day_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_au AFTER UPDATE OF note ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (end_of_day_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+               INSERT INTO end_of_day_notes_fts (rowid, note) VALUES (new.id, new.note);
+           END""",
+        # Index the notes that already exist
+        "INSERT INTO end_of_day_notes_fts (end_of_day_notes_fts) VALUES ('rebuild')",
+    ]),
+    (4, "Per-table change counters", [
+        # One row per table, bumped once per changed row by the triggers below.
+        # Unlike PRAGMA data_version this is visible to every connection and
+        # says *which* table changed, so caches can tell their own writes apart.
+        """CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )""",
+        """INSERT OR IGNORE INTO table_versions (table_name) VALUES
+            ('tasks'), ('house_maintenance_tasks'), ('end_of_day_notes')""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_version_ai AFTER INSERT ON tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_version_au AFTER UPDATE ON tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_version_ad AFTER DELETE ON tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS house_maintenance_tasks_version_ai AFTER INSERT ON house_maintenance_tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'house_maintenance_tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS house_maintenance_tasks_version_au AFTER UPDATE ON house_maintenance_tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'house_maintenance_tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS house_maintenance_tasks_version_ad AFTER DELETE ON house_maintenance_tasks BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'house_maintenance_tasks';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_ai AFTER INSERT ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_au AFTER UPDATE ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_ad AFTER DELETE ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+    ]),
+    (5, "Integer day number for note date ranges", [
+        # date.toordinal() of DateAdded (julianday of 0001-01-01 is 1721425.5).  A virtual
+        # column costs nothing per row; the index stores the numbers for range scans.
+        """ALTER TABLE end_of_day_notes ADD COLUMN DayNumber INTEGER
+           GENERATED ALWAYS AS (CAST(julianday(DateAdded) - 1721424.5 AS INTEGER)) VIRTUAL""",
+        "CREATE INDEX IF NOT EXISTS idx_end_of_day_notes_day_id ON end_of_day_notes (DayNumber, id)",
+    ]),
+    (6, "Materialized daily plan", [
+        # One row per plan line (the day's active tasks, then the previous
+        # working day's notes), keyed so a day's plan is a single range read.
+        '''CREATE TABLE IF NOT EXISTS daily_plan (
+            PlanDate TEXT NOT NULL,
+            Position INTEGER NOT NULL,
+            Kind TEXT NOT NULL,         -- 'task' or 'note'
+            RefId INTEGER NOT NULL,     -- tasks.id or end_of_day_notes.id
+            FromTime TEXT,
+            ToTime TEXT,
+            Text TEXT NOT NULL,         -- task name (house maintenance slot resolved) or note text
+            NoteDate TEXT,
+            PRIMARY KEY (PlanDate, Position)
+        ) WITHOUT ROWID''',
+        # Version = sum of the table_versions counters when the plan was built;
+        # any write to the three source tables makes it stale.
+        '''CREATE TABLE IF NOT EXISTS daily_plan_meta (
+            PlanDate TEXT PRIMARY KEY,
+            Version INTEGER NOT NULL,
+            BuiltAt TEXT NOT NULL
+        )''',
+    ]),
+    (7, "Change log for incremental sync", [
+        # This database's sync identity (see DBSync).  apply_origin is set only
+        # inside the transaction that applies another node's changes, so the
+        # log can tell those rows from local edits.
+        '''CREATE TABLE IF NOT EXISTS sync_node (
+            node_id TEXT NOT NULL,
+            apply_origin TEXT
+        )''',
+        "INSERT INTO sync_node (node_id) SELECT lower(hex(randomblob(8))) WHERE NOT EXISTS (SELECT 1 FROM sync_node)",
+        # One row per changed row, in commit order.  row_data is the row after
+        # the change as a JSON object (NULL for a delete).
+        '''CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+            row_data TEXT,
+            changed_at TEXT NOT NULL,
+            origin TEXT                 -- NULL for local edits, else the node (or 'archive') it came from
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_id, seq)",
+        # How far this database has got with each node it syncs with
+        '''CREATE TABLE IF NOT EXISTS sync_state (
+            peer TEXT PRIMARY KEY,
+            received_seq INTEGER NOT NULL DEFAULT 0,   -- last seq of the peer's log applied here
+            sent_seq INTEGER NOT NULL DEFAULT 0,       -- last seq of our log the peer has applied
+            synced_at TEXT
+        )''',
+        *_change_log_triggers('tasks', ('FromTime', 'ToTime', 'TaskName', 'Active')),
+        *_change_log_triggers('house_maintenance_tasks', ('task_name',)),
+        *_change_log_triggers('end_of_day_notes', ('note', 'DateAdded')),
+    ]),
+    (8, "Record changes only while there is a replica", [
+        # Without a peer nothing reads the log, and a full row copy per write
+        # would double the hot file.  init_replica adds the sync_state row
+        # before it takes its snapshot, so no change is missed.
+        *_drop_change_log_triggers('tasks'),
+        *_drop_change_log_triggers('house_maintenance_tasks'),
+        *_drop_change_log_triggers('end_of_day_notes'),
+        *_change_log_triggers('tasks', ('FromTime', 'ToTime', 'TaskName', 'Active'),
+                              when="EXISTS (SELECT 1 FROM sync_state)"),
+        *_change_log_triggers('house_maintenance_tasks', ('task_name',),
+                              when="EXISTS (SELECT 1 FROM sync_state)"),
+        *_change_log_triggers('end_of_day_notes', ('note', 'DateAdded'),
+                              when="EXISTS (SELECT 1 FROM sync_state)"),
+        "DELETE FROM change_log WHERE NOT EXISTS (SELECT 1 FROM sync_state)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Migrations for the notes archive database (see DBArchive), which DBCommands
+# attaches to every pooled connection as the `archive` schema.  Same rules as
+# MIGRATIONS; they run on a direct connection to the archive file.
+ARCHIVE_MIGRATIONS = [
+    (1, "Archived end of day notes with full-text search", [
+        # Same columns as end_of_day_notes; ids are kept when a note is archived
+        '''CREATE TABLE IF NOT EXISTS end_of_day_notes (
+            id INTEGER PRIMARY KEY,
+            note TEXT NOT NULL,
+            DateAdded DATE NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_end_of_day_notes_date_id ON end_of_day_notes (DateAdded, id)",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS end_of_day_notes_fts
+           USING fts5(note, content='end_of_day_notes', content_rowid='id')""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_ai AFTER INSERT ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (rowid, note) VALUES (new.id, new.note);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_ad AFTER DELETE ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (end_of_day_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_fts_au AFTER UPDATE OF note ON end_of_day_notes BEGIN
+               INSERT INTO end_of_day_notes_fts (end_of_day_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+               INSERT INTO end_of_day_notes_fts (rowid, note) VALUES (new.id, new.note);
+           END""",
+    ]),
+    (2, "Integer day number for note date ranges", [
+        # Same as migration 5 of MIGRATIONS
+        """ALTER TABLE end_of_day_notes ADD COLUMN DayNumber INTEGER
+           GENERATED ALWAYS AS (CAST(julianday(DateAdded) - 1721424.5 AS INTEGER)) VIRTUAL""",
+        "CREATE INDEX IF NOT EXISTS idx_end_of_day_notes_day_id ON end_of_day_notes (DayNumber, id)",
+    ]),
+    (3, "Change counter for archived notes", [
+        # Same as migration 4 of MIGRATIONS, so edits to archived notes count as
+        # changes too (see DBMiddleware.get_routine_version)
+        """CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )""",
+        "INSERT OR IGNORE INTO table_versions (table_name) VALUES ('end_of_day_notes')",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_ai AFTER INSERT ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_au AFTER UPDATE ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS end_of_day_notes_version_ad AFTER DELETE ON end_of_day_notes BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = 'end_of_day_notes';
+           END""",
+    ]),
+]
+
+ARCHIVE_SCHEMA_VERSION = ARCHIVE_MIGRATIONS[-1][0]
+
+def get_schema_version(conn) -> int:
+    """Return the migration version recorded in the database (0 for a new file)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, migrations=MIGRATIONS) -> list:
+    """Apply every migration newer than the database's user_version
+    (migrations: MIGRATIONS for MorningRoutine.db, ARCHIVE_MIGRATIONS for the archive).
+    Each step runs in its own transaction together with its user_version bump,
+    so an interrupted upgrade can simply be re-run.
+    Returns: list of version numbers applied (empty if already current).
+    """
+    current = get_schema_version(conn)
+    applied = []
+    for version, _description, statements in migrations:
+        if version <= current:
+            continue
+        conn.execute("BEGIN")
+        try:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version:d}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
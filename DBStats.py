@@ -0,0 +1,140 @@
+"""Optional query timing instrumentation for DBCommands.
+
+Disabled by default so run_sql pays only a flag check.  Turn it on with
+enable_stats() (TaskCLI does this for `--stats`) or by setting the
+MORNINGROUTINE_DB_STATS environment variable before the program starts.
+
+While enabled it keeps:
+- a latency histogram per statement, keyed by normalized SQL
+- counters for connections opened and commits
+- a slow-query log file for statements slower than the threshold
+"""
+import logging
+import os
+import re
+import threading
+
+# Upper bounds (ms) of the histogram buckets; a final bucket catches everything slower
+BUCKET_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+DEFAULT_SLOW_MS = 100.0
+DEFAULT_SLOW_LOG = 'slow_queries.log'
+
+enabled = False         # checked directly by DBCommands on every statement
+slow_query_ms = DEFAULT_SLOW_MS
+
+_lock = threading.Lock()
+_timings = {}           # normalized sql -> [count, total_ms, max_ms, bucket counts]
+_counters = {}          # e.g. 'connects', 'commits'
+_slow_log = logging.getLogger('MorningRoutine.slow_queries')
+_slow_log.propagate = False
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+
+def enable_stats(slow_ms: float = DEFAULT_SLOW_MS, log_path: str | None = DEFAULT_SLOW_LOG):
+    """Start collecting statistics.
+    Inputs:
+    - slow_ms: statements taking at least this many milliseconds are logged
+    - log_path: file the slow-query log is appended to (None disables the log)
+    """
+    global enabled, slow_query_ms
+    with _lock:
+        slow_query_ms = slow_ms
+        for handler in list(_slow_log.handlers):
+            _slow_log.removeHandler(handler)
+            handler.close()
+        if log_path:
+            handler = logging.FileHandler(log_path, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            _slow_log.addHandler(handler)
+            _slow_log.setLevel(logging.WARNING)
+        else:
+            # Without a handler logging would fall back to printing on stderr
+            _slow_log.addHandler(logging.NullHandler())
+        enabled = True
+
+def disable_stats():
+    """Stop collecting statistics (already collected numbers are kept)."""
+    global enabled
+    enabled = False
+
+def stats_enabled() -> bool:
+    """Return True while statistics are being collected."""
+    return enabled
+
+def reset_stats():
+    """Clear all collected timings and counters."""
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+def normalize_sql(sql: str) -> str:
+    """Reduce a statement to its shape: literals become ?, whitespace is collapsed,
+    and IN lists of any length become IN (?...), so equivalent statements share a key."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (?...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+def count(name: str, n: int = 1):
+    """Add n to the named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def record_query(sql: str, seconds: float):
+    """Record one execution of sql that took `seconds`."""
+    ms = seconds * 1000.0
+    key = normalize_sql(sql)
+    bucket = len(BUCKET_BOUNDS_MS)
+    for i, bound in enumerate(BUCKET_BOUNDS_MS):
+        if ms <= bound:
+            bucket = i
+            break
+    with _lock:
+        entry = _timings.get(key)
+        if entry is None:
+            entry = _timings[key] = [0, 0.0, 0.0, [0] * (len(BUCKET_BOUNDS_MS) + 1)]
+        entry[0] += 1
+        entry[1] += ms
+        entry[2] = max(entry[2], ms)
+        entry[3][bucket] += 1
+    if ms >= slow_query_ms:
+        _slow_log.warning("%.1f ms  %s", ms, key)
+
+def get_stats() -> dict:
+    """Return a snapshot of the collected statistics.
+    Returns: {'counters': {name: n}, 'queries': {sql: {'count', 'total_ms', 'max_ms', 'histogram'}}}
+    where histogram maps each bucket's upper bound in ms ('inf' for the last) to a count.
+    """
+    labels = [str(b) for b in BUCKET_BOUNDS_MS] + ['inf']
+    with _lock:
+        queries = {
+            sql: {'count': n, 'total_ms': total, 'max_ms': worst,
+                  'histogram': dict(zip(labels, buckets))}
+            for sql, (n, total, worst, buckets) in _timings.items()
+        }
+        return {'counters': dict(_counters), 'queries': queries}
+
+def format_stats() -> str:
+    """Return the collected statistics as a printable report, slowest total time first."""
+    stats = get_stats()
+    lines = ["\n--- Database Statistics ---"]
+    for name, value in sorted(stats['counters'].items()):
+        lines.append(f"{name}: {value}")
+    if not stats['queries']:
+        lines.append("No statements recorded.")
+        return "\n".join(lines)
+    lines.append("")
+    lines.append("Count   Total ms   Avg ms    Max ms  Statement")
+    lines.append("------  ---------  --------  ------  ------------------------------")
+    ordered = sorted(stats['queries'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    for sql, q in ordered:
+        avg = q['total_ms'] / q['count']
+        lines.append(f"{q['count']:<7} {q['total_ms']:<10.2f} {avg:<9.3f} {q['max_ms']:<7.2f} {sql}")
+    return "\n".join(lines)
+
+# Allow turning instrumentation on without code changes
+if os.environ.get('MORNINGROUTINE_DB_STATS'):
+    enable_stats(float(os.environ.get('MORNINGROUTINE_SLOW_MS', DEFAULT_SLOW_MS)),
+                 os.environ.get('MORNINGROUTINE_SLOW_LOG', DEFAULT_SLOW_LOG))
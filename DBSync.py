@@ -0,0 +1,296 @@
+"""Change log and incremental sync between MorningRoutine.db and a replica file.
+
+Triggers (migration 7) record every insert, update and delete on tasks,
+house_maintenance_tasks and end_of_day_notes in change_log, numbered by an
+ever-increasing seq.  A sync only reads the log entries after the point the
+other side has already reached, so its cost follows the number of edits, not
+the size of the database.
+
+    batch = export_changes(since_seq, peer)     # JSON-serializable dict
+    result = apply_changes(batch, 'laptop.db')  # or target=None for the open database
+    pulled, pushed = sync_replica('laptop.db')  # both directions at once
+
+Each database has a node id (sync_node) and remembers, per peer, the last seq
+it received from that peer and the last seq of its own the peer has applied
+(sync_state).
+
+Conflicts: a row changed on both sides since their last sync is settled by the policy
+- 'newest' (default): the later edit wins (UTC change times; the incoming edit on a tie)
+- 'source': the incoming edit wins
+- 'target': the target's edit is kept and goes back to the source on the next sync
+A row inserted on both sides under the same id is not a conflict: the target's
+row is moved to a new id so both are kept.
+
+Changes are only recorded while the database has at least one peer, and
+sync_replica prunes what both sides have applied, so without a replica the log
+stays empty.  Make replicas with init_replica (`TaskCLI.py sync` does this the
+first time) rather than by copying the file: edits made before the peer
+existed are not in the log.
+
+Notes moved out by DBArchive are not synced as deletes, so a replica keeps
+them until it archives its own.
+
+Run: python TaskCLI.py sync laptop.db [--policy newest|source|target]
+"""
+import json
+import os
+import sqlite3
+from collections import namedtuple
+
+from DBCommands import pooled_connection, run_sql, snapshot_db, transaction, DBError
+from DBMigrations import migrate
+from DBTransfer import TABLE_COLUMNS
+
+POLICIES = ('newest', 'source', 'target')
+DEFAULT_POLICY = 'newest'
+
+# Origin recorded for the deletes DBArchive makes; they are never sent to other nodes
+ARCHIVE_ORIGIN = 'archive'
+
+# applied:    incoming changes written to the target
+# skipped:    incoming changes that lost a conflict
+# renumbered: target rows moved to a new id to make room for an incoming insert
+# seq:        the source's log is now applied up to this seq
+SyncResult = namedtuple('SyncResult', ['applied', 'skipped', 'renumbered', 'seq'])
+
+def get_node_id(conn=None) -> str:
+    """Return the sync node id of conn's database (default: the open database)."""
+    if conn is None:
+        return run_sql("SELECT node_id FROM sync_node")[0][0]
+    return conn.execute("SELECT node_id FROM sync_node").fetchone()[0]
+
+def _last_seq(conn) -> int:
+    # sqlite_sequence rather than MAX(seq): it survives prune_change_log emptying the log
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+def _received_seq(conn, peer: str) -> int:
+    row = conn.execute("SELECT received_seq FROM sync_state WHERE peer = ?", (peer,)).fetchone()
+    return row[0] if row else 0
+
+def _export(conn, since_seq: int, peer: str | None) -> dict:
+    """Read the changes after since_seq from conn; see export_changes."""
+    last = _last_seq(conn)
+    # Only the latest entry per row is sent (row_data holds the whole row), and
+    # not when that entry came from the peer itself.  The op is 'I' when the row
+    # was created in the range, so the target can spot two inserts under one id.
+    # A row created and deleted again in the range is left out altogether: the
+    # peer never had it, and its own row under that id may be a different one.
+    rows = conn.execute("""
+        SELECT c.seq, c.table_name, c.row_id,
+               CASE WHEN c.op = 'D' THEN 'D'
+                    WHEN EXISTS (SELECT 1 FROM change_log i
+                                 WHERE i.table_name = c.table_name AND i.row_id = c.row_id
+                                   AND i.seq > :since AND i.op = 'I'
+                                   AND (i.origin IS NULL OR i.origin != :peer)) THEN 'I'
+                    ELSE 'U' END,
+               c.row_data, c.changed_at
+        FROM change_log c
+        WHERE c.seq > :since AND c.seq <= :last
+          AND c.seq = (SELECT MAX(m.seq) FROM change_log m
+                       WHERE m.table_name = c.table_name AND m.row_id = c.row_id)
+          AND (c.origin IS NULL OR c.origin NOT IN (:peer, :archive))
+          AND NOT (c.op = 'D' AND EXISTS (
+                   SELECT 1 FROM (SELECT f.op, f.origin FROM change_log f
+                                  WHERE f.table_name = c.table_name AND f.row_id = c.row_id AND f.seq > :since
+                                  ORDER BY f.seq LIMIT 1) first
+                   WHERE first.op = 'I' AND (first.origin IS NULL OR first.origin != :peer)))
+        ORDER BY c.seq""",
+        {'since': since_seq, 'last': last, 'peer': peer or '', 'archive': ARCHIVE_ORIGIN}).fetchall()
+    return {
+        'node': get_node_id(conn),
+        'since': since_seq,
+        'seq': max(last, since_seq),
+        # How much of the peer's own log this node has applied (for conflict checks on the peer)
+        'seen': _received_seq(conn, peer) if peer else 0,
+        'changes': [list(row) for row in rows],
+    }
+
+def export_changes(since_seq: int = 0, peer: str | None = None) -> dict:
+    """Return the open database's changes after since_seq, for apply_changes.
+    Inputs:
+    - since_seq: the batch 'seq' the target last applied (0 for everything in the log)
+    - peer: the target's node id; its own changes are left out and its progress is
+      included so the target can detect conflicts
+    Returns: {'node', 'since', 'seq', 'seen', 'changes': [[seq, table, row_id, op, row_json, changed_at], ...]}
+    """
+    with pooled_connection() as conn:
+        return _export(conn, since_seq, peer)
+
+def _incoming_wins(policy: str, incoming_at: str, local_at: str) -> bool:
+    if policy == 'source':
+        return True
+    if policy == 'target':
+        return False
+    return incoming_at >= local_at
+
+def _renumber(conn, table: str, row_id: int, columns: tuple, origin: str) -> bool:
+    """Move the target's row row_id to a new id.  Logged as a local edit, so the
+    source receives the row under its new id on the next sync."""
+    names = ', '.join(columns)
+    row = conn.execute(f"SELECT {names} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    if row is None:
+        return False
+    conn.execute("UPDATE sync_node SET apply_origin = NULL")
+    conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+    conn.execute(f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(columns))})", row)
+    conn.execute("UPDATE sync_node SET apply_origin = ?", (origin,))
+    return True
+
+def _apply(conn, batch: dict, policy: str) -> SyncResult:
+    """Apply batch on conn, which must already be inside a transaction; see apply_changes."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown conflict policy '{policy}'. Choose one of: {', '.join(POLICIES)}")
+    source = batch['node']
+    if source == get_node_id(conn):
+        raise DBError("Both databases have the same sync node id (one is a plain file copy of the other); "
+                      "create replicas with init_replica().")
+    received = _received_seq(conn, source)
+    if batch['since'] > received:
+        raise DBError(f"Changes {received + 1}-{batch['since']} from node {source} have not been applied here; "
+                      f"export again from seq {received}.")
+    for table in {change[1] for change in batch['changes']}:
+        if table not in TABLE_COLUMNS:
+            raise ValueError(f"Unknown table '{table}' in change batch.")
+        # Keep new local ids clear of every incoming id, so a renumbered row can't collide again
+        top = max(change[2] for change in batch['changes'] if change[1] == table)
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (top, table))
+
+    applied = skipped = renumbered = 0
+    conn.execute("UPDATE sync_node SET apply_origin = ?", (source,))
+    for _seq, table, row_id, op, row_data, changed_at in batch['changes']:
+        columns = TABLE_COLUMNS[table][1:]
+        # Edits here that the source hasn't seen yet
+        local = conn.execute("""SELECT op, changed_at, origin FROM change_log
+                                WHERE table_name = ? AND row_id = ? AND seq > ?
+                                  AND (origin IS NULL OR origin != ?)
+                                ORDER BY seq""", (table, row_id, batch['seen'], source)).fetchall()
+        if local:
+            if local[-1][2] == ARCHIVE_ORIGIN:
+                # The note lives in this side's archive now; leave it there
+                skipped += 1
+                continue
+            created_here = any(entry[0] == 'I' for entry in local)
+            if op == 'D' and created_here:
+                # The row under this id was added here; the source's delete was for its own row
+                skipped += 1
+                continue
+            if op == 'I' and created_here:
+                renumbered += _renumber(conn, table, row_id, columns, source)
+            elif not _incoming_wins(policy, changed_at, local[-1][1]):
+                skipped += 1
+                continue
+        if op == 'D':
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        else:
+            data = json.loads(row_data)
+            updates = ', '.join(f"{c} = excluded.{c}" for c in columns)
+            conn.execute(f"""INSERT INTO {table} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})
+                             ON CONFLICT (id) DO UPDATE SET {updates}""",
+                         (row_id, *(data[c] for c in columns)))
+        applied += 1
+    conn.execute("UPDATE sync_node SET apply_origin = NULL")
+    conn.execute("""INSERT INTO sync_state (peer, received_seq, sent_seq, synced_at)
+                    VALUES (?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+                    ON CONFLICT (peer) DO UPDATE SET received_seq = excluded.received_seq,
+                        sent_seq = MAX(sent_seq, excluded.sent_seq), synced_at = excluded.synced_at""",
+                 (source, batch['seq'], batch['seen']))
+    return SyncResult(applied, skipped, renumbered, batch['seq'])
+
+def _open_file(path: str) -> sqlite3.Connection:
+    """Open a database file other than the pool's, bringing its schema up to date."""
+    if not os.path.exists(path):
+        raise DBError(f"No such database file: '{path}'.")
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        migrate(conn)
+    except sqlite3.Error as e:
+        raise DBError(str(e)) from e
+    return conn
+
+def _apply_to_file(conn, batch: dict, policy: str) -> SyncResult:
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = _apply(conn, batch, policy)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    except sqlite3.Error as e:
+        raise DBError(str(e)) from e
+    return result
+
+def apply_changes(batch: dict, target: str | None = None, policy: str = DEFAULT_POLICY) -> SyncResult:
+    """Apply a batch from export_changes in one transaction.
+    Inputs:
+    - batch: changes exported from another node
+    - target: database file to apply them to (default: the open database)
+    - policy: conflict rule, one of POLICIES
+    Raises: DBError if the batch starts after the point the target has reached.
+    """
+    if target is None:
+        with transaction() as conn:
+            return _apply(conn, batch, policy)
+    conn = _open_file(target)
+    try:
+        return _apply_to_file(conn, batch, policy)
+    finally:
+        conn.close()
+
+def init_replica(path: str) -> str:
+    """Create a replica of the open database at path, with its own node id.
+    Returns: the replica's node id."""
+    if os.path.exists(path):
+        raise DBError(f"'{path}' already exists.")
+    replica_id = os.urandom(8).hex()
+    # Register the peer before the snapshot so the change log is recording from here on;
+    # anything written after seq is copied too and simply sent again on the first sync
+    with transaction() as conn:
+        node_id, seq = get_node_id(conn), _last_seq(conn)
+        conn.execute("INSERT INTO sync_state (peer, sent_seq) VALUES (?, ?)", (replica_id, seq))
+    try:
+        replica = snapshot_db(path)
+    except BaseException:
+        run_sql("DELETE FROM sync_state WHERE peer = ?", (replica_id,))
+        raise
+    try:
+        with replica:
+            replica.execute("UPDATE sync_node SET node_id = ?, apply_origin = NULL", (replica_id,))
+            replica.execute("DELETE FROM change_log")
+            replica.execute("DELETE FROM sync_state")
+            replica.execute("INSERT INTO sync_state (peer, received_seq) VALUES (?, ?)", (node_id, seq))
+    finally:
+        replica.close()
+    return replica_id
+
+def sync_replica(path: str, policy: str = DEFAULT_POLICY) -> tuple:
+    """Two-way sync between the open database and a replica file made by init_replica.
+    The replica's edits are applied here first, then this database's edits (and
+    the conflicts settled here) are applied to the replica.  Afterwards both
+    change logs are pruned of what the other side has applied.
+    Returns: (pulled, pushed) SyncResults.
+    """
+    replica = _open_file(path)
+    try:
+        replica_id = get_node_id(replica)
+        with pooled_connection() as conn:
+            node_id = get_node_id(conn)
+            since = _received_seq(conn, replica_id)
+        pulled = apply_changes(_export(replica, since, node_id), policy=policy)
+        with pooled_connection() as conn:
+            batch = _export(conn, _received_seq(replica, node_id), replica_id)
+        pushed = _apply_to_file(replica, batch, policy)
+        with replica:
+            replica.execute(_PRUNE_SQL)
+    finally:
+        replica.close()
+    prune_change_log()
+    return pulled, pushed
+
+_PRUNE_SQL = "DELETE FROM change_log WHERE seq <= (SELECT MIN(sent_seq) FROM sync_state)"
+
+def prune_change_log() -> int:
+    """Delete the change_log entries every known peer has already applied.
+    Returns: number of entries deleted (none until at least one peer has synced)."""
+    return run_sql(_PRUNE_SQL)
@@ -0,0 +1,220 @@
+"""Streaming CSV / JSON Lines export and import for the MorningRoutine tables.
+
+Exports stream rows straight from iter_sql to the file, and imports read,
+validate and insert the file in batches (one transaction per batch).  Memory
+use stays flat however large the table or archive is.
+
+Example:
+    export_table('end_of_day_notes', 'notes.jsonl')
+    result = import_table('end_of_day_notes', 'notes.jsonl')
+    print(result.imported, result.rejected, result.errors)
+"""
+import csv
+import json
+import os
+from collections import namedtuple
+from datetime import date
+from itertools import islice
+
+from DBCommands import iter_sql, run_sql_many, transaction, ARCHIVE_SCHEMA
+from DBMiddleware_end_of_day_notes import union_note_tables
+from GenericFunctions import is_valid_time
+
+# Exported columns per table, in file order (id first)
+TABLE_COLUMNS = {
+    'tasks': ('id', 'FromTime', 'ToTime', 'TaskName', 'Active'),
+    'house_maintenance_tasks': ('id', 'task_name'),
+    'end_of_day_notes': ('id', 'note', 'DateAdded'),
+}
+
+FORMATS = ('csv', 'jsonl')
+
+IMPORT_BATCH_SIZE = 1000
+
+# Only the first few rejected rows are described in ImportResult.errors
+MAX_REPORTED_ERRORS = 20
+
+ImportResult = namedtuple('ImportResult', ['imported', 'rejected', 'errors'])
+
+def _check_table(table: str):
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table '{table}'. Choose one of: {', '.join(TABLE_COLUMNS)}")
+
+def detect_format(path: str, fmt: str | None = None) -> str:
+    """Return fmt if given, otherwise guess 'csv' or 'jsonl' from the file extension."""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = 'csv' if ext == '.csv' else 'jsonl' if ext in ('.jsonl', '.json', '.ndjson') else None
+        if fmt is None:
+            raise ValueError(f"Can't tell the format of '{path}'; use a .csv or .jsonl file or pass a format.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(FORMATS)}")
+    return fmt
+
+def export_table(table: str, path: str, fmt: str | None = None, include_archive: bool = True) -> int:
+    """Write every row of a table to a CSV (with header) or JSON Lines file, ordered by id.
+    Inputs:
+    - include_archive: for end_of_day_notes, also write the notes moved to the archive (see DBArchive)
+    Returns: number of rows written.
+    """
+    _check_table(table)
+    fmt = detect_format(path, fmt)
+    columns = TABLE_COLUMNS[table]
+    if table == 'end_of_day_notes' and include_archive:
+        # Both tables are read in id order, so SQLite merges them without a sort
+        rows = iter_sql(union_note_tables(f"SELECT {', '.join(columns)} FROM {{notes}}") + " ORDER BY id")
+    else:
+        rows = iter_sql(f"SELECT {', '.join(columns)} FROM main.{table} ORDER BY id")
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                f.write('\n')
+                count += 1
+    return count
+
+def _read_records(path: str, fmt: str):
+    """Yield (line_number, dict) for each record in the file."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, ValueError(f"invalid JSON: {e.msg}")
+                    continue
+                yield line_number, record if isinstance(record, dict) else ValueError("expected a JSON object")
+
+def _text(record: dict, key: str) -> str:
+    """Return a required, non-blank text field."""
+    value = record.get(key)
+    if value is None or not str(value).strip():
+        raise ValueError(f"{key} cannot be blank")
+    return str(value).strip()
+
+def _flag(value) -> int:
+    """Parse an Active flag from CSV text or JSON (missing means active)."""
+    if value is None or value == '':
+        return 1
+    if isinstance(value, bool):
+        return 1 if value else 0
+    text = str(value).strip().lower()
+    if text in ('1', 'y', 'yes', 'true', 't'):
+        return 1
+    if text in ('0', 'n', 'no', 'false', 'f'):
+        return 0
+    raise ValueError(f"Active must be 1/0, true/false or y/n, not '{value}'")
+
+def _validate_task(record: dict) -> tuple:
+    from_time, to_time = _text(record, 'FromTime'), _text(record, 'ToTime')
+    if not is_valid_time(from_time) or not is_valid_time(to_time):
+        raise ValueError("times must be in HH:MM format (e.g., 09:30)")
+    return (from_time, to_time, _text(record, 'TaskName'), _flag(record.get('Active')))
+
+def _validate_house_maint_task(record: dict) -> tuple:
+    return (_text(record, 'task_name'),)
+
+def _validate_note(record: dict) -> tuple:
+    note, date_added = _text(record, 'note'), _text(record, 'DateAdded')
+    try:
+        # date.fromisoformat is far cheaper than strptime on millions of rows;
+        # the length check rejects the other ISO spellings it also accepts
+        if len(date_added) != 10:
+            raise ValueError
+        date.fromisoformat(date_added)
+    except ValueError:
+        raise ValueError(f"DateAdded must be YYYY-MM-DD, not '{date_added}'") from None
+    return (note, date_added)
+
+_VALIDATORS = {
+    'tasks': _validate_task,
+    'house_maintenance_tasks': _validate_house_maint_task,
+    'end_of_day_notes': _validate_note,
+}
+
+def _insert_sql(table: str, keep_ids: bool) -> str:
+    """Build the INSERT used for imports.  With keep_ids, rows whose id already
+    exists are updated in place (an upsert, so the notes' search triggers stay correct)."""
+    columns = TABLE_COLUMNS[table][1:]
+    if keep_ids:
+        columns = ('id',) + columns
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    if keep_ids:
+        if table == 'end_of_day_notes':
+            # Ids of archived notes are updated in the archive instead (see _ARCHIVED_NOTE_UPDATE);
+            # the extra parameter is the id again
+            sql = (f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join('?' for _ in columns)}"
+                   f" WHERE NOT EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.{table} WHERE id = ?)")
+        updates = ', '.join(f"{c} = excluded.{c}" for c in columns[1:])
+        sql += f" ON CONFLICT (id) DO UPDATE SET {updates}"
+    return sql
+
+# With keep_ids, a note whose id is in the archive is overwritten there, so the id never exists twice
+_ARCHIVED_NOTE_UPDATE = f"UPDATE {ARCHIVE_SCHEMA}.end_of_day_notes SET note = ?, DateAdded = ? WHERE id = ?"
+
+def import_table(table: str, path: str, fmt: str | None = None, keep_ids: bool = False,
+                 batch_size: int = IMPORT_BATCH_SIZE) -> ImportResult:
+    """Validate and insert rows from a CSV or JSON Lines file, batch_size rows per transaction.
+    Inputs:
+    - keep_ids: use the file's id column (existing rows with that id are overwritten,
+      archived notes in the archive); by default rows are appended with new ids
+    Rows that fail validation are skipped and counted, not inserted.
+    Returns: ImportResult(imported, rejected, errors) where errors describes the
+    first MAX_REPORTED_ERRORS rejected rows as "line N: reason".
+    """
+    _check_table(table)
+    fmt = detect_format(path, fmt)
+    validate = _VALIDATORS[table]
+    sql = _insert_sql(table, keep_ids)
+    rejected = 0
+    errors = []
+
+    def valid_rows():
+        nonlocal rejected
+        for line_number, record in _read_records(path, fmt):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                params = validate(record)
+                if keep_ids:
+                    if record.get('id') in (None, ''):
+                        raise ValueError("id is required when keeping ids")
+                    params = (int(record['id']),) + params
+            except (ValueError, TypeError) as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_number}: {e}")
+                continue
+            yield params
+
+    imported = 0
+    rows = valid_rows()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        if keep_ids and table == 'end_of_day_notes':
+            with transaction():
+                run_sql_many(_ARCHIVED_NOTE_UPDATE, [(note, date_added, note_id) for note_id, note, date_added in batch])
+                run_sql_many(sql, [row + (row[0],) for row in batch])
+        else:
+            run_sql_many(sql, batch)
+        imported += len(batch)
+
+    if table == 'house_maintenance_tasks':
+        from DBMiddleware_house_maintenance_tasks import invalidate_house_maint_cache
+        invalidate_house_maint_cache()
+    return ImportResult(imported, rejected, errors)
@@ -1,8 +1,39 @@
-from datetime import datetime
+import re
+from datetime import date, datetime
+from functools import lru_cache
 
 def parse_date(date_str: str) -> datetime.date:
     """Parse a date string in MM/DD/YY format into a datetime.date.
     Example: '11/13/25' -> datetime.date(2025, 11, 13)"""
     return datetime.strptime(date_str, '%m/%d/%y').date()
 
+@lru_cache(maxsize=512)
+def _parse_date_text(text: str) -> date:
+    """Parse YYYY-MM-DD or MM/DD/YY.  Cached: the same few dates are looked up over and over."""
+    if len(text) == 10 and text[4] == '-':
+        return date.fromisoformat(text)
+    return parse_date(text)
 
+def to_date(value) -> date:
+    """Return a datetime.date for a date, datetime, day number, or YYYY-MM-DD / MM/DD/YY string."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, int):
+        return date.fromordinal(value)
+    return _parse_date_text(value.strip())
+
+def to_day_number(value) -> int:
+    """Return the day number for a date (see to_date for accepted values).
+    Day numbers are date.toordinal() values (0001-01-01 is day 1); the database
+    keeps the same number in end_of_day_notes.DayNumber for range queries."""
+    return to_date(value).toordinal()
+
+def to_db_date(value=None) -> str:
+    """Return the YYYY-MM-DD text stored in the database for a date (default today)."""
+    return (date.today() if value is None else to_date(value)).isoformat()
+
+def is_valid_time(time_str: str) -> bool:
+    """Check if time is in HH:MM format (24-hour)."""
+    return bool(re.match(r'^\d{2}:\d{2}$', time_str))
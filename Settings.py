@@ -0,0 +1,50 @@
+"""Local settings for MorningRoutine.
+
+Settings are read from MorningRoutine.ini in the current directory (or the file
+named by the MORNINGROUTINE_SETTINGS environment variable), for example:
+
+    [database]
+    profile = safe
+    cache_size = -16000
+
+Any value can be overridden with an environment variable named
+MORNINGROUTINE_<SECTION>_<KEY>, e.g. MORNINGROUTINE_DATABASE_PROFILE=legacy.
+"""
+import configparser
+import os
+
+SETTINGS_FILE = 'MorningRoutine.ini'
+
+_parser = None
+
+def _load() -> configparser.ConfigParser:
+    """Read the settings file once and cache the parser."""
+    global _parser
+    if _parser is None:
+        parser = configparser.ConfigParser()
+        path = os.environ.get('MORNINGROUTINE_SETTINGS') or os.path.join(os.getcwd(), SETTINGS_FILE)
+        parser.read(path, encoding='utf-8')     # a missing file simply means "all defaults"
+        _parser = parser
+    return _parser
+
+def reload_settings():
+    """Forget cached settings so the next lookup re-reads the file."""
+    global _parser
+    _parser = None
+
+def get_setting(section: str, key: str, default: str | None = None) -> str | None:
+    """Return a setting as a string: environment override, then settings file, then default."""
+    env_value = os.environ.get(f"MORNINGROUTINE_{section}_{key}".upper())
+    if env_value is not None:
+        return env_value
+    return _load().get(section, key, fallback=default)
+
+def get_section(section: str) -> dict:
+    """Return every key set in a section of the settings file (environment overrides applied)."""
+    parser = _load()
+    values = dict(parser.items(section)) if parser.has_section(section) else {}
+    prefix = f"MORNINGROUTINE_{section}_".upper()
+    for name, value in os.environ.items():
+        if name.startswith(prefix):
+            values[name[len(prefix):].lower()] = value
+    return values
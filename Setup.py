@@ -1,68 +1,63 @@
-import os
-import sqlite3
+import sys
+
+from DBCommands import GetConn, resolve_db_target
+from DBMigrations import migrate, SCHEMA_VERSION
+
+# Usage: python Setup.py [--reset]
+#   Creates MorningRoutine.db (or upgrades an existing one in place) and seeds
+#   empty tables.  --reset clears all three tables and reseeds them.
+#   The file can be changed with `path` in the [database] settings or
+#   MORNINGROUTINE_DATABASE_PATH (see Settings.py).
+reset = '--reset' in sys.argv[1:]
+
+SEED_HOUSE_MAINT_TASKS = [
+    ('Yard Maintenance',),
+    ('Organize a Drawer/Shelf',),
+    ('Sell Unused Item on Marketplace',),
+    ('Clean Eufy Vacuums',),
+    ('Laundry',),
+    ('Organize Computer Files',),
+    ('Cleanup Office',),
+]
+
+SEED_TASKS = [
+    ('07:30', '08:00', 'Wake Up & Stretch', 1),
+    ('08:00', '08:30', 'Breakfast', 1),
+    ('08:30', '09:30', 'Stock Research', 1),
+    ('09:30', '10:00', 'House Maintenance Task', 1),
+    ('10:00', '11:00', 'Focused Work Session', 1),
+    ('11:00', '11:30', 'Break / Walk', 1),
+    ('11:30', '12:00', 'Daily Goal Setting', 1),
+    ('12:00', '12:30', 'Wrap Up Morning Routine', 1),
+]
+
+db_path, db_mode = resolve_db_target()
+if db_mode != 'file':
+    sys.exit(f"Setup.py prepares a database file, but the database mode is set to '{db_mode}'.")
+print(f"Database: {db_path}")
 
-from DBCommands import GetConn
-
-# Create a cursor object
 conn = GetConn()
-cursor = conn.cursor()
 
-# Create house_maintenance_tasks table
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS house_maintenance_tasks (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    task_name TEXT NOT NULL
-    )
-''')
+# Create any missing tables/indexes; existing data is left alone
+applied = migrate(conn)
+if applied:
+    print(f"Applied schema migrations: {', '.join(str(v) for v in applied)}")
 
-cursor.execute('DELETE FROM house_maintenance_tasks')  # Clear existing data for idempotency
-cursor.execute('''
-    INSERT INTO house_maintenance_tasks (task_name) VALUES
-    ('Yard Maintenance'),
-    ('Organize a Drawer/Shelf'),
-    ('Sell Unused Item on Marketplace'),
-    ('Clean Eufy Vacuums'),
-    ('Laundry'),
-    ('Organize Computer Files'),
-    ('Cleanup Office');
-''')
-
-# Create TASKS table
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        FromTime TIME NOT NULL,
-        ToTime TIME NOT NULL,
-        TaskName TEXT NOT NULL,
-        Active BOOLEAN NOT NULL DEFAULT 1
-    )
-''')
+cursor = conn.cursor()
 
-cursor.execute('DELETE FROM tasks')  # Clear existing data for idempotency
-cursor.execute('''
-    INSERT INTO tasks (FromTime, ToTime, TaskName, Active) VALUES
-        ('07:30', '08:00', 'Wake Up & Stretch', 1),
-        ('08:00', '08:30', 'Breakfast', 1),
-        ('08:30', '09:30', 'Stock Research', 1),
-        ('09:30', '10:00', 'House Maintenance Task', 1),
-        ('10:00', '11:00', 'Focused Work Session', 1),
-        ('11:00', '11:30', 'Break / Walk', 1),
-        ('11:30', '12:00', 'Daily Goal Setting', 1),
-        ('12:00', '12:30', 'Wrap Up Morning Routine', 1);
-''')
+if reset:
+    cursor.execute('DELETE FROM house_maintenance_tasks')
+    cursor.execute('DELETE FROM tasks')
+    cursor.execute('DELETE FROM end_of_day_notes')
 
-# Create End of Day Notes table
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS end_of_day_notes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        note TEXT NOT NULL,
-        DateAdded DATE NOT NULL
-    )
-''')
+# Seed lookup tables only when they are empty so re-running Setup.py keeps user edits
+if cursor.execute('SELECT COUNT(*) FROM house_maintenance_tasks').fetchone()[0] == 0:
+    cursor.executemany('INSERT INTO house_maintenance_tasks (task_name) VALUES (?)', SEED_HOUSE_MAINT_TASKS)
 
-cursor.execute('DELETE FROM end_of_day_notes')  # Clear existing data for idempotency
+if cursor.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == 0:
+    cursor.executemany('INSERT INTO tasks (FromTime, ToTime, TaskName, Active) VALUES (?, ?, ?, ?)', SEED_TASKS)
 
 conn.commit()       # Commit the changes
 conn.close()        # Close the connection
 
-print("Database and tables created successfully.")
+print(f"Database is at schema version {SCHEMA_VERSION}.")
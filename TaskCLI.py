@@ -1,11 +1,28 @@
-"""Interactive CLI for managing tasks in the MorningRoutine database. Run: python TaskCLI.py """
+"""Interactive CLI for managing tasks in the MorningRoutine database. Run: python TaskCLI.py [--stats]
 
-import re
-from DBMiddleware import (list_tasks, add_task, update_task, delete_task, get_task, toggle_task_active,
+--stats  time every database statement and print a summary on exit (slow ones go to slow_queries.log)
+
+Given a subcommand (e.g. `python TaskCLI.py plan`) it runs that one operation
+and exits instead; see TaskCommands.py or `python TaskCLI.py --help`.
+"""
+
+import sys
+
+if __name__ == '__main__':
+    # Hand off to the command front end before importing the database modules,
+    # so one-shot commands only load what they use.  Interactive mode comes
+    # back here through TaskCommands.run_interactive().
+    from TaskCommands import main as _command_main
+    sys.exit(_command_main(sys.argv[1:]))
+
+from DBCommands import open_db, close_db, transaction, DBError
+from GenericFunctions import is_valid_time
+from DBMiddleware import (list_tasks, get_daily_plan, add_task, update_task, delete_task, get_task, toggle_task_active,
+                          check_task_times, find_task_conflicts, find_all_task_conflicts, find_inverted_tasks,
                           get_all_house_maint_tasks, add_house_maint_task, update_house_maint_task,
                           delete_house_maint_task, get_house_maint_task,
-                          add_note, get_note, update_note, delete_note, list_notes, 
-                          list_notes_by_date, get_todays_note, get_yestedays_note)
+                          add_note, get_note, update_note, delete_note, list_notes_page, search_notes,
+                          get_todays_note)
 
 MENU = """
 --- Task Manager ---
@@ -23,7 +40,8 @@ EDITS_MENU = """
 3. Edit task
 4. Delete task
 5. Toggle active
-6. Back to Main Menu
+6. Show schedule conflicts
+7. Back to Main Menu
 Choose: """
 
 HOUSE_MAINT_MENU = """
@@ -42,12 +60,13 @@ NOTES_MENU = """
 3. Add note
 4. Edit note
 5. Delete note
-6. Back to Main Menu
+6. Search notes
+7. Back to Main Menu
 Choose: """
 
-def is_valid_time(time_str):
-    """Check if time is in HH:MM format (24-hour)."""
-    return bool(re.match(r'^\d{2}:\d{2}$', time_str))
+NOTES_PAGE_SIZE = 10
+
+CHANGED_ELSEWHERE = "Error: This record was changed by another session while you were editing. Record not saved."
 
 def display_tasks():
     rows = list_tasks()
@@ -61,6 +80,25 @@ def display_tasks():
         print(f"{tid:<3} {fr:<5} {to:<5} {'Y' if active else 'N':<6} {name}")
     print()
 
+def confirm_schedule(fr: str, to: str, active: bool, exclude_id: int | None = None) -> bool:
+    """Reject inverted slots and, for active tasks, warn about overlapping active tasks.
+    Returns True if the task should be saved."""
+    try:
+        check_task_times(fr, to)
+    except ValueError as e:
+        print(f"Error: {e} Record not saved.")
+        return False
+    conflicts = find_task_conflicts(fr, to, exclude_id) if active else []
+    if not conflicts:
+        return True
+    print(f"Warning: {fr}-{to} overlaps {len(conflicts)} active task(s):")
+    for tid, c_fr, c_to, c_name in conflicts:
+        print(f"  {tid:<3} {c_fr}-{c_to}  {c_name}")
+    if not (input("Save anyway? (y/n) [n]: ").strip().lower() or 'n').startswith('y'):
+        print("Record not saved.")
+        return False
+    return True
+
 def prompt_add():
     print("Add new task:")
     fr = input("From time (HH:MM): ").strip()
@@ -74,6 +112,8 @@ def prompt_add():
         return
     active_in = input("Active? (y/n) [y]: ").strip().lower() or 'y'
     active = active_in.startswith('y')
+    if not confirm_schedule(fr, to, active):
+        return
     new_id = add_task(fr, to, name, active)
     print(f"Inserted task id {new_id}.")
 
@@ -101,7 +141,14 @@ def prompt_edit():
         return
     active_in = input(f"Active (y/n) [{'y' if active_old else 'n'}]: ").strip().lower()
     active = active_old if active_in == '' else active_in.startswith('y')
-    updated = update_task(tid, from_time=fr, to_time=to, task_name=name, active=active)
+    if not confirm_schedule(fr, to, active, exclude_id=tid):
+        return
+    with transaction():
+        # Re-check inside the transaction so another session's edit isn't silently overwritten
+        if get_task(tid) != row:
+            print(CHANGED_ELSEWHERE)
+            return
+        updated = update_task(tid, from_time=fr, to_time=to, task_name=name, active=active)
     print(f"Updated {updated} row(s).")
 
 def prompt_delete():
@@ -130,10 +177,23 @@ def prompt_toggle():
     else:
         print("Task not found.")
 
+def display_conflicts():
+    """Print every pair of overlapping active tasks and any inverted time slots."""
+    pairs = find_all_task_conflicts()
+    inverted = find_inverted_tasks()
+    if not pairs and not inverted:
+        print("No schedule conflicts.")
+        return
+    for a, b in pairs:
+        print(f"{a[0]:<3} {a[1]}-{a[2]} {a[3]}  overlaps  {b[0]:<3} {b[1]}-{b[2]} {b[3]}")
+    for tid, fr, to, name in inverted:
+        print(f"{tid:<3} {fr}-{to} {name}  ends before it starts")
+    print()
+
 def print_todays_plan():
     """Print a concise ordered list of active tasks with time ranges."""
-    rows = list_tasks()
-    active_rows = [r for r in rows if r[4]]  # r = (id, FromTime, ToTime, TaskName, Active)
+    plan = get_daily_plan()         # stored plan, rebuilt only after the tables change
+    active_rows = plan.tasks        # rows = (id, FromTime, ToTime, TaskName, Active)
     if not active_rows:
         print("No active tasks for today.\n")
     else:
@@ -145,11 +205,12 @@ def print_todays_plan():
         print()
     
     # Print yesterday's end of day notes
-    yesterday_notes = get_yestedays_note()
+    yesterday_notes = plan.notes
     if yesterday_notes:
         print("Yesterday's Reflection:")
         print("-" * 40)
-        print(yesterday_notes[1])  # yesterday_notes[1] is the note text
+        for _, note, _ in yesterday_notes:
+            print(note)
         print()
 
 def edits_submenu():
@@ -167,6 +228,8 @@ def edits_submenu():
         elif choice == '5':
             prompt_toggle()
         elif choice == '6':
+            display_conflicts()
+        elif choice == '7':
             break
         else:
             print("Invalid selection. Returning to main menu.")
@@ -213,7 +276,11 @@ def prompt_edit_house_maint():
     if not name:
         print("Error: Task name cannot be blank. Record not saved.")
         return
-    updated = update_house_maint_task(tid, name)
+    with transaction():
+        if get_house_maint_task(tid) != row:
+            print(CHANGED_ELSEWHERE)
+            return
+        updated = update_house_maint_task(tid, name)
     print(f"Updated {updated} row(s).")
 
 def prompt_delete_house_maint():
@@ -250,18 +317,43 @@ def house_maint_submenu():
             break
 
 def display_notes(notes):
-    """Display a list of notes."""
-    if not notes:
-        print("No notes found.")
-        return
-    print("\nID  Date       Note")
-    print("--  ---------- " + "-" * 40)
+    """Display notes from a list or a streaming iterator (printed as rows arrive)."""
+    found = False
     for r in notes:
+        if not found:
+            print("\nID  Date       Note")
+            print("--  ---------- " + "-" * 40)
+            found = True
         note_id, note, date_added = r
         note_preview = note[:40] + "..." if len(note) > 40 else note
         print(f"{note_id:<3} {date_added:<10} {note_preview}")
+    if not found:
+        print("No notes found.")
+        return
     print()
 
+def browse_notes():
+    """Page through all notes, newest first, with next/previous navigation."""
+    rows = list_notes_page(limit=NOTES_PAGE_SIZE)
+    if not rows:
+        print("No notes found.")
+        return
+    while True:
+        display_notes(rows)
+        nav = input("[n]ext page, [p]revious page, Enter to return: ").strip().lower()
+        if nav == 'n':
+            last_id, _, last_date = rows[-1]
+            page = list_notes_page(after=(last_date, last_id), limit=NOTES_PAGE_SIZE)
+        elif nav == 'p':
+            first_id, _, first_date = rows[0]
+            page = list_notes_page(before=(first_date, first_id), limit=NOTES_PAGE_SIZE)
+        else:
+            break
+        if page:
+            rows = page
+        else:
+            print("No more notes in that direction.")
+
 def prompt_add_note():
     """Add a new end of day note."""
     print("Add new end of day note:")
@@ -295,7 +387,11 @@ def prompt_edit_note():
         print("Error: Note cannot be blank. Record not saved.")
         return
     try:
-        updated = update_note(note_id, note)
+        with transaction():
+            if get_note(note_id) != row:
+                print(CHANGED_ELSEWHERE)
+                return
+            updated = update_note(note_id, note)
         print(f"Updated {updated} row(s).")
     except ValueError as e:
         print(f"Error: {e}")
@@ -316,6 +412,14 @@ def prompt_delete_note():
     deleted = delete_note(note_id)
     print(f"Deleted {deleted} row(s).")
 
+def prompt_search_notes():
+    """Search all notes for a word or stock symbol."""
+    query = input("Search for (e.g. AAPL, or AAP* for a prefix): ").strip()
+    if not query:
+        print("Error: Search text cannot be blank.")
+        return
+    display_notes(search_notes(query, limit=NOTES_PAGE_SIZE * 5))
+
 def notes_submenu():
     """Handle the End of Day Notes submenu."""
     while True:
@@ -324,8 +428,7 @@ def notes_submenu():
             notes = get_todays_note()
             display_notes(notes)
         elif choice == '2':
-            notes = list_notes()
-            display_notes(notes)
+            browse_notes()
         elif choice == '3':
             prompt_add_note()
         elif choice == '4':
@@ -333,6 +436,8 @@ def notes_submenu():
         elif choice == '5':
             prompt_delete_note()
         elif choice == '6':
+            prompt_search_notes()
+        elif choice == '7':
             break
         else:
             print("Invalid selection. Returning to main menu.")
@@ -340,24 +445,29 @@ def notes_submenu():
 
 
 def main():
-    while True:
-        choice = input(MENU).strip()
-        if choice == '':
-            print("Goodbye.")
-            break
-        elif choice == '1':
-            print_todays_plan()
-        elif choice == '2':
-            edits_submenu()
-        elif choice == '3':
-            house_maint_submenu()
-        elif choice == '4':
-            notes_submenu()
-        elif choice == '5':
-            print("Goodbye.")
-            break
-        else:
-            print("Invalid selection.")
-
-if __name__ == '__main__':
-    main()
+    open_db()       # Keep database connections open for the whole session
+    try:
+        while True:
+            choice = input(MENU).strip()
+            try:
+                if choice == '':
+                    print("Goodbye.")
+                    break
+                elif choice == '1':
+                    print_todays_plan()
+                elif choice == '2':
+                    edits_submenu()
+                elif choice == '3':
+                    house_maint_submenu()
+                elif choice == '4':
+                    notes_submenu()
+                elif choice == '5':
+                    print("Goodbye.")
+                    break
+                else:
+                    print("Invalid selection.")
+            except DBError as e:
+                # Nothing was saved; report it and return to the main menu
+                print(f"Database error: {e}. Record not saved.")
+    finally:
+        close_db()
@@ -0,0 +1,341 @@
+"""Non-interactive command mode for TaskCLI.
+
+Each subcommand runs one operation and exits, so cron jobs and shell scripts
+don't have to pipe keystrokes into the menus:
+
+    python TaskCLI.py plan [--date MM/DD/YY]
+    python TaskCLI.py tasks list
+    python TaskCLI.py tasks add 06:00 06:30 "Meditation" [--inactive] [--no-overlap]
+    python TaskCLI.py tasks conflicts
+    python TaskCLI.py tasks delete ID
+    python TaskCLI.py tasks toggle ID
+    python TaskCLI.py notes add "Follow up on PAYX"
+    python TaskCLI.py notes list [--date YYYY-MM-DD | --from YYYY-MM-DD [--to YYYY-MM-DD] | --working-days N]
+                                 [--limit N | --all]
+    python TaskCLI.py notes search QUERY [--limit N]
+    python TaskCLI.py maint list
+    python TaskCLI.py maint add NAME
+    python TaskCLI.py maint today [--date MM/DD/YY]
+    python TaskCLI.py export TABLE FILE [--format csv|jsonl] [--no-archive]
+    python TaskCLI.py import TABLE FILE [--format csv|jsonl] [--keep-ids]
+    python TaskCLI.py archive [--days N] [--dry-run] [--vacuum]
+    python TaskCLI.py serve [--host H] [--port P] [--workers N]
+    python TaskCLI.py sync REPLICA.db [--policy newest|source|target]
+
+With no subcommand the interactive menu starts.  `--stats` (before the
+subcommand) prints database timing statistics on exit.
+
+Database modules are imported inside each handler, so a command only loads
+the table module it works with.  Exit status: 0 success, 1 failure, 2 usage error.
+"""
+import argparse
+import sys
+
+def _print_tasks(rows):
+    """Print task rows as aligned columns."""
+    if not rows:
+        print("No tasks found.")
+        return
+    print("ID  From   To     Active Name")
+    for tid, fr, to, name, active in rows:
+        print(f"{tid:<3} {fr:<5} {to:<5} {'Y' if active else 'N':<6} {name}")
+
+def _print_notes(rows) -> int:
+    """Print note rows (list or iterator); returns how many were printed."""
+    count = 0
+    for note_id, note, date_added in rows:
+        print(f"{note_id}\t{date_added}\t{note}")
+        count += 1
+    return count
+
+def cmd_plan(args) -> int:
+    from DBMiddleware import get_daily_plan
+    plan = get_daily_plan(args.date)
+    if not plan.tasks:
+        print("No active tasks.")
+    for _, fr, to, name, _ in plan.tasks:
+        print(f"{fr}-{to:<9} {name}")
+    if plan.notes:
+        print("\nYesterday's Reflection:")
+        for _, note, _ in plan.notes:
+            print(note)
+    return 0
+
+def cmd_tasks_list(args) -> int:
+    from DBMiddleware import list_tasks
+    _print_tasks(list_tasks(args.date))
+    return 0
+
+def cmd_tasks_add(args) -> int:
+    from GenericFunctions import is_valid_time
+    if not args.name.strip():
+        print("Error: Task name cannot be blank.", file=sys.stderr)
+        return 1
+    if not is_valid_time(args.from_time) or not is_valid_time(args.to_time):
+        print("Error: Times must be in HH:MM format (e.g., 09:30).", file=sys.stderr)
+        return 1
+    from DBMiddleware_task_conflicts import check_task_times, find_task_conflicts
+    check_task_times(args.from_time, args.to_time)
+    conflicts = [] if args.inactive else find_task_conflicts(args.from_time, args.to_time)
+    for tid, fr, to, name in conflicts:
+        print(f"Warning: overlaps task {tid} {fr}-{to} {name}", file=sys.stderr)
+    if conflicts and args.no_overlap:
+        print("Error: Task not added (--no-overlap).", file=sys.stderr)
+        return 1
+    from DBMiddleware_tasks import add_task
+    new_id = add_task(args.from_time, args.to_time, args.name.strip(), not args.inactive)
+    print(new_id)
+    return 0
+
+def cmd_tasks_conflicts(args) -> int:
+    from DBMiddleware_task_conflicts import find_all_task_conflicts, find_inverted_tasks
+    pairs = find_all_task_conflicts()
+    inverted = find_inverted_tasks()
+    for a, b in pairs:
+        print(f"{a[0]}\t{a[1]}-{a[2]}\t{a[3]}\t{b[0]}\t{b[1]}-{b[2]}\t{b[3]}")
+    for tid, fr, to, name in inverted:
+        print(f"{tid}\t{fr}-{to}\t{name}\tinverted")
+    return 1 if pairs or inverted else 0
+
+def cmd_tasks_delete(args) -> int:
+    from DBMiddleware_tasks import delete_task
+    if not delete_task(args.id):
+        print("Task not found.", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_tasks_toggle(args) -> int:
+    from DBMiddleware_tasks import toggle_task_active
+    if not toggle_task_active(args.id):
+        print("Task not found.", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_notes_add(args) -> int:
+    from DBMiddleware_end_of_day_notes import add_note
+    try:
+        new_id = add_note(args.note)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(new_id)
+    return 0
+
+def cmd_notes_list(args) -> int:
+    from datetime import date
+    import DBMiddleware_end_of_day_notes as notes
+    if args.date:
+        rows = notes.list_notes_by_date(args.date)
+    elif args.start:
+        rows = notes.list_notes_between(args.start, args.end or date.today())
+    elif args.working_days:
+        rows = notes.list_notes_for_working_days(args.working_days)
+    elif args.all:
+        rows = notes.list_notes()
+    else:
+        rows = notes.list_notes_page(limit=args.limit)
+    if not _print_notes(rows):
+        print("No notes found.")
+    return 0
+
+def cmd_notes_search(args) -> int:
+    from DBMiddleware_end_of_day_notes import search_notes
+    try:
+        rows = search_notes(args.query, args.limit)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not _print_notes(rows):
+        print("No notes found.")
+    return 0
+
+def cmd_maint_list(args) -> int:
+    from DBMiddleware_house_maintenance_tasks import get_all_house_maint_tasks
+    rows = get_all_house_maint_tasks()
+    if not rows:
+        print("No house maintenance tasks found.")
+    for tid, name in rows:
+        print(f"{tid:<3} {name}")
+    return 0
+
+def cmd_maint_add(args) -> int:
+    if not args.name.strip():
+        print("Error: Task name cannot be blank.", file=sys.stderr)
+        return 1
+    from DBMiddleware_house_maintenance_tasks import add_house_maint_task
+    print(add_house_maint_task(args.name.strip()))
+    return 0
+
+def cmd_maint_today(args) -> int:
+    from datetime import datetime
+    from DBMiddleware_house_maintenance_tasks import get_house_maint_task_by_date
+    print(get_house_maint_task_by_date(args.date or datetime.now()))
+    return 0
+
+def cmd_export(args) -> int:
+    from DBTransfer import export_table
+    count = export_table(args.table, args.file, args.format, include_archive=not args.no_archive)
+    print(f"Exported {count} row(s) from {args.table} to {args.file}.")
+    return 0
+
+def cmd_import(args) -> int:
+    from DBTransfer import import_table
+    result = import_table(args.table, args.file, args.format, keep_ids=args.keep_ids)
+    print(f"Imported {result.imported} row(s) into {args.table}; rejected {result.rejected}.")
+    for error in result.errors:
+        print(f"  {error}", file=sys.stderr)
+    return 1 if result.rejected else 0
+
+def cmd_archive(args) -> int:
+    import DBArchive
+    if args.dry_run:
+        count = DBArchive.count_archivable_notes(args.days)
+        print(f"{count} note(s) dated before {DBArchive.archive_cutoff(args.days)} would be archived.")
+        return 0
+    moved = DBArchive.archive_notes(args.days)
+    print(f"Archived {moved} note(s) dated before {DBArchive.archive_cutoff(args.days)}.")
+    if args.vacuum:
+        DBArchive.vacuum_database()
+    return 0
+
+def cmd_serve(args) -> int:
+    from TaskServer import serve
+    return serve(args.host, args.port, args.workers)
+
+def cmd_sync(args) -> int:
+    import os
+    import DBSync
+    if not os.path.exists(args.replica):
+        DBSync.init_replica(args.replica)
+        print(f"Created replica {args.replica}.")
+        return 0
+    pulled, pushed = DBSync.sync_replica(args.replica, args.policy)
+    print(f"Received {pulled.applied} change(s) from {args.replica}, sent {pushed.applied}.")
+    if pulled.skipped or pushed.skipped:
+        print(f"Conflicts settled by '{args.policy}': {pulled.skipped + pushed.skipped} edit(s) overruled.")
+    if pulled.renumbered or pushed.renumbered:
+        print(f"{pulled.renumbered + pushed.renumbered} row(s) added on both sides were given new ids.")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(
+        prog='TaskCLI.py',
+        description="MorningRoutine task manager. Run without a command for the interactive menu.")
+    parser.add_argument('--stats', action='store_true',
+                        help="print database timing statistics on exit")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    p = commands.add_parser('plan', help="print today's plan and yesterday's notes")
+    p.add_argument('--date', help="plan for another day (MM/DD/YY); notes are from the working day before it")
+    p.set_defaults(func=cmd_plan)
+
+    tasks = commands.add_parser('tasks', help="list or edit tasks").add_subparsers(dest='action', metavar='action', required=True)
+    p = tasks.add_parser('list', help="list all tasks")
+    p.add_argument('--date', help="fill the house maintenance slot for this day (MM/DD/YY)")
+    p.set_defaults(func=cmd_tasks_list)
+    p = tasks.add_parser('add', help="add a task; prints the new id")
+    p.add_argument('from_time', help="start time, HH:MM")
+    p.add_argument('to_time', help="end time, HH:MM")
+    p.add_argument('name', help="task name")
+    p.add_argument('--inactive', action='store_true', help="add the task as inactive")
+    p.add_argument('--no-overlap', action='store_true', help="refuse to add a task that overlaps an active one")
+    p.set_defaults(func=cmd_tasks_add)
+    p = tasks.add_parser('conflicts', help="list overlapping and inverted active tasks (exit 1 if any)")
+    p.set_defaults(func=cmd_tasks_conflicts)
+    p = tasks.add_parser('delete', help="delete a task by id")
+    p.add_argument('id', type=int)
+    p.set_defaults(func=cmd_tasks_delete)
+    p = tasks.add_parser('toggle', help="toggle a task's active flag")
+    p.add_argument('id', type=int)
+    p.set_defaults(func=cmd_tasks_toggle)
+
+    notes = commands.add_parser('notes', help="add, list or search end of day notes").add_subparsers(dest='action', metavar='action', required=True)
+    p = notes.add_parser('add', help="add a note for today; prints the new id")
+    p.add_argument('note')
+    p.set_defaults(func=cmd_notes_add)
+    p = notes.add_parser('list', help="list notes, newest first")
+    p.add_argument('--date', help="only notes for this day (YYYY-MM-DD)")
+    p.add_argument('--from', dest='start', help="notes dated from this day (YYYY-MM-DD) ...")
+    p.add_argument('--to', dest='end', help="... up to and including this day (default today)")
+    p.add_argument('--working-days', type=int, metavar='N', help="only notes from the last N working days")
+    p.add_argument('--limit', type=int, default=20, help="number of notes to show (default 20)")
+    p.add_argument('--all', action='store_true', help="stream every note")
+    p.set_defaults(func=cmd_notes_list)
+    p = notes.add_parser('search', help="full-text search of notes")
+    p.add_argument('query')
+    p.add_argument('--limit', type=int, default=20)
+    p.set_defaults(func=cmd_notes_search)
+
+    maint = commands.add_parser('maint', help="house maintenance rotation").add_subparsers(dest='action', metavar='action', required=True)
+    p = maint.add_parser('list', help="list the rotation")
+    p.set_defaults(func=cmd_maint_list)
+    p = maint.add_parser('add', help="add a task to the rotation; prints the new id")
+    p.add_argument('name')
+    p.set_defaults(func=cmd_maint_add)
+    p = maint.add_parser('today', help="print the house maintenance task for a day")
+    p.add_argument('--date', help="another day (MM/DD/YY)")
+    p.set_defaults(func=cmd_maint_today)
+
+    tables = ('tasks', 'house_maintenance_tasks', 'end_of_day_notes')
+    p = commands.add_parser('export', help="stream a table to a CSV or JSON Lines file")
+    p.add_argument('table', choices=tables)
+    p.add_argument('file', help="output file (.csv or .jsonl)")
+    p.add_argument('--format', choices=('csv', 'jsonl'), help="override the format implied by the extension")
+    p.add_argument('--no-archive', action='store_true', help="leave out archived end of day notes")
+    p.set_defaults(func=cmd_export)
+    p = commands.add_parser('import', help="validate and load a CSV or JSON Lines file in batches")
+    p.add_argument('table', choices=tables)
+    p.add_argument('file', help="input file (.csv or .jsonl)")
+    p.add_argument('--format', choices=('csv', 'jsonl'), help="override the format implied by the extension")
+    p.add_argument('--keep-ids', action='store_true', help="keep the file's ids, overwriting rows that already exist")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser('archive', help="move old end of day notes into the archive database")
+    p.add_argument('--days', type=int, help="archive notes older than N days (default: [archive] days setting, else 365)")
+    p.add_argument('--dry-run', action='store_true', help="only count the notes that would move")
+    p.add_argument('--vacuum', action='store_true', help="shrink MorningRoutine.db afterwards")
+    p.set_defaults(func=cmd_archive)
+
+    p = commands.add_parser('serve', help="serve the plan, tasks, rotation and notes as JSON over HTTP")
+    p.add_argument('--host', help="address to listen on (default 127.0.0.1; 0.0.0.0 for the LAN)")
+    p.add_argument('--port', type=int, help="port (default 8080)")
+    p.add_argument('--workers', type=int, help="worker threads (default 4)")
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser('sync', help="two-way sync with a replica database file (created on first use)")
+    p.add_argument('replica', help="replica database file, e.g. laptop.db")
+    p.add_argument('--policy', choices=('newest', 'source', 'target'), default='newest',
+                   help="who wins when a row was edited on both sides (default: the newest edit)")
+    p.set_defaults(func=cmd_sync)
+
+    return parser
+
+def run_interactive():
+    """Start the interactive menu."""
+    from TaskCLI import main as interactive_main
+    interactive_main()
+
+def main(argv=None) -> int:
+    """Parse argv, run one command (or the interactive menu) and return the exit status."""
+    args = build_parser().parse_args(argv)
+    if args.stats:
+        from DBStats import enable_stats
+        enable_stats()
+    try:
+        if args.command is None:
+            run_interactive()
+            return 0
+        from DBCommands import DBError
+        try:
+            return args.func(args)
+        except DBError as e:
+            print(f"Database error: {e}", file=sys.stderr)
+            return 1
+        except ValueError as e:      # e.g. a badly formatted --date
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    finally:
+        import DBStats
+        if DBStats.stats_enabled():
+            print(DBStats.format_stats(), file=sys.stderr if args.command else sys.stdout)
@@ -0,0 +1,220 @@
+"""Read-only JSON API over the MorningRoutine data, for phones and wall displays on the LAN.
+
+Run: python TaskServer.py [--host 127.0.0.1] [--port 8080] [--workers 4]
+ or: python TaskCLI.py serve [...]
+
+Endpoints (all GET; dates as YYYY-MM-DD or MM/DD/YY):
+    /plan [?date=]                       today's plan and the previous working day's notes
+    /tasks [?date=]                      every task, house maintenance slot filled in
+    /rotation                            the house maintenance rotation and today's task
+    /notes [?limit=&after=DATE,ID]       newest notes, one page at a time
+    /notes [?date=] or [?from=&to=]      notes for a day or a date range
+    /notes/search ?q= [&limit=]          full-text search
+
+Every response carries an ETag built from the table_versions change counters
+(MorningRoutine.db and the notes archive) and today's date.  A client that
+sends it back in If-None-Match gets 304 Not Modified until something changes;
+only the one-row version query is run, not the endpoint's own query.
+
+Requests are handled by a fixed pool of worker threads that share the
+DBCommands connection pool.  Settings (see Settings.py):
+
+    [server]
+    host = 127.0.0.1     ; use 0.0.0.0 to serve the whole LAN
+    port = 8080
+    workers = 4
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from DBCommands import open_db, close_db, DBError
+from Settings import get_setting
+import DBMiddleware
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 4
+
+MAX_LIMIT = 500     # largest page a client may ask for
+
+class HTTPError(Exception):
+    """Turned into a JSON error response with the given status."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _task_json(row) -> dict:
+    tid, fr, to, name, active = row
+    return {'id': tid, 'from': fr, 'to': to, 'name': name, 'active': bool(active)}
+
+def _note_json(row) -> dict:
+    note_id, note, date_added = row
+    return {'id': note_id, 'note': note, 'date': date_added}
+
+def _limit(query: dict, default: int = 20) -> int:
+    try:
+        limit = int(query.get('limit', default))
+    except ValueError:
+        raise HTTPError(400, "limit must be a number") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+def get_plan(query: dict) -> dict:
+    plan = DBMiddleware.get_daily_plan(query.get('date'))
+    return {'date': plan.date,
+            'tasks': [_task_json(row) for row in plan.tasks],
+            'notes': [_note_json(row) for row in plan.notes]}
+
+def get_tasks(query: dict) -> dict:
+    return {'tasks': [_task_json(row) for row in DBMiddleware.list_tasks(query.get('date'))]}
+
+def get_rotation(query: dict) -> dict:
+    return {'rotation': list(DBMiddleware.get_house_maint_rotation()),
+            'today': DBMiddleware.get_house_maint_task_by_date(date.today())}
+
+def get_notes(query: dict) -> dict:
+    if 'date' in query:
+        rows = DBMiddleware.list_notes_by_date(query['date'])
+    elif 'from' in query:
+        rows = DBMiddleware.list_notes_between(query['from'], query.get('to') or date.today())
+    else:
+        after = None
+        if 'after' in query:
+            try:
+                after_date, after_id = query['after'].split(',')
+                after = (after_date, int(after_id))
+            except ValueError:
+                raise HTTPError(400, "after must be DATE,ID (the last note of the previous page)") from None
+        rows = DBMiddleware.list_notes_page(after=after, limit=_limit(query))
+    return {'notes': [_note_json(row) for row in rows]}
+
+def search_notes(query: dict) -> dict:
+    if not query.get('q', '').strip():
+        raise HTTPError(400, "q is required")
+    return {'notes': [_note_json(row) for row in DBMiddleware.search_notes(query['q'], _limit(query))]}
+
+def get_index(query: dict) -> dict:
+    return {'endpoints': sorted(ROUTES)}
+
+ROUTES = {
+    '/': get_index,
+    '/plan': get_plan,
+    '/tasks': get_tasks,
+    '/rotation': get_rotation,
+    '/notes': get_notes,
+    '/notes/search': search_notes,
+}
+
+def current_etag() -> str:
+    """Return the ETag shared by every response until the data (or the day) changes."""
+    return f'"{DBMiddleware.get_routine_version()}-{date.today().isoformat()}"'
+
+class TaskRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'MorningRoutine/1.0'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool):
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip('/') or '/')
+        try:
+            if route is None:
+                raise HTTPError(404, f"No such endpoint: {url.path}")
+            # Read the version before the data, so a write in between only
+            # makes the next request re-fetch; it can't hide a change.
+            etag = current_etag()
+            if self._etag_matches(etag):
+                self._send(304, None, etag, send_body)
+                return
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._send(200, route(query), etag, send_body)
+        except HTTPError as e:
+            self._send(e.status, {'error': str(e)}, None, send_body)
+        except ValueError as e:     # bad dates and other invalid parameters
+            self._send(400, {'error': str(e)}, None, send_body)
+        except DBError as e:
+            self.log_error("Database error: %s", e)
+            self._send(500, {'error': "database error"}, None, send_body)
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+    def _send(self, status: int, payload, etag: str | None, send_body: bool):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')      # clients may keep it, but must revalidate
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads
+    (ThreadingHTTPServer would start a new thread per connection)."""
+
+    def __init__(self, address, handler, workers: int = DEFAULT_WORKERS):
+        super().__init__(address, handler)
+        self._workers = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self._workers.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._workers.shutdown(wait=True)
+
+def make_server(host: str | None = None, port: int | None = None, workers: int | None = None) -> PooledHTTPServer:
+    """Open the database and return a server ready for serve_forever(); arguments default to the [server] settings."""
+    host = host or get_setting('server', 'host', DEFAULT_HOST)
+    port = port if port is not None else int(get_setting('server', 'port', str(DEFAULT_PORT)))
+    workers = workers or int(get_setting('server', 'workers', str(DEFAULT_WORKERS)))
+    # One pooled connection per worker, plus one spare for plan rebuilds
+    open_db(pool_size=workers + 1)
+    return PooledHTTPServer((host, port), TaskRequestHandler, workers)
+
+def serve(host: str | None = None, port: int | None = None, workers: int | None = None) -> int:
+    """Run the server until Ctrl+C."""
+    server = make_server(host, port, workers)
+    print(f"Serving MorningRoutine on http://{server.server_address[0]}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_db()
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the MorningRoutine plan, tasks, rotation and notes as JSON.")
+    parser.add_argument('--host', help=f"address to listen on (default: [server] host, else {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, help=f"port (default: [server] port, else {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, help=f"worker threads (default: [server] workers, else {DEFAULT_WORKERS})")
+    args = parser.parse_args(argv)
+    return serve(args.host, args.port, args.workers)
+
+if __name__ == '__main__':
+    raise SystemExit(main())
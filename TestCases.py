@@ -1,33 +1,30 @@
-from DBMiddleware import (get_all_house_maint_tasks, get_house_maint_task_by_date, list_tasks,
+from DBMiddleware import (get_all_house_maint_tasks, get_house_maint_task_by_date, get_house_maint_schedule, list_tasks,
                           add_note, get_note, update_note, delete_note, list_notes,
                           get_todays_note, get_yestedays_note)
-from DBCommands import run_sql
-from datetime import datetime, timedelta
+from DBMiddleware import (add_task, add_tasks, update_task, get_task, toggle_task_active,
+                          find_task_conflicts, find_all_task_conflicts)
+from DBMiddleware_task_conflicts import TaskIntervalIndex, get_task_interval_index
+from DBCommands import run_sql, open_db
+from DBSync import init_replica, sync_replica
+from BusinessCalendar import previous_working_day
+from datetime import datetime
+import os
+import sqlite3
+import tempfile
+import time
 
 # -----------------------------
 # Helper functions
 # -----------------------------
 def add_note_for_yesterday(note: str) -> int:
-    """Add a note for yesterday's date (skipping weekends).
-    If today is Monday, adds note for Friday.
-    If today is Sunday, adds note for Friday.
-    Otherwise adds note for yesterday.
+    """Add a note for the previous working day (skipping weekends and holidays,
+    see BusinessCalendar), i.e. the day get_yestedays_note() reads.
     Returns: new note id (int)
     """
     if not note or not note.strip():
         raise ValueError("Note cannot be blank.")
     
-    today = datetime.now()
-    weekday = today.weekday()  # Monday=0, Sunday=6
-    
-    if weekday == 0:  # Monday - add for Friday (3 days back)
-        target_date = today - timedelta(days=3)
-    elif weekday == 6:  # Sunday - add for Friday (2 days back)
-        target_date = today - timedelta(days=2)
-    else:  # Tuesday-Saturday - add for yesterday (1 day back)
-        target_date = today - timedelta(days=1)
-    
-    target_date_str = target_date.strftime('%Y-%m-%d')
+    target_date_str = previous_working_day().isoformat()
     sql = "INSERT INTO end_of_day_notes (note, DateAdded) VALUES (?, ?)"
     new_id = run_sql(sql, (note.strip(), target_date_str))
     return new_id
@@ -68,6 +65,15 @@ def test_get_house_maint_task_by_date():
     print(get_house_maint_task_by_date('11/02/25') == "Cleanup Office")
     print(get_house_maint_task_by_date('11/03/25') == "Yard Maintenance")  # Loop back
 
+def test_get_house_maint_schedule():
+    """Schedule for a range must match the single-day lookup for every day."""
+    schedule = get_house_maint_schedule('10/27/25', 30)
+    matches = all(
+        schedule.tasks[idx] == get_house_maint_task_by_date(datetime.fromordinal(ordinal).strftime('%m/%d/%y'))
+        for ordinal, idx in zip(schedule.ordinals, schedule.indices)
+    )
+    print(len(schedule.ordinals) == 30 and matches)
+
 def test_end_of_day_notes():
     """Test End of Day Notes CRUD operations."""
     print("\n--- Testing End of Day Notes ---")
@@ -105,8 +111,8 @@ def test_end_of_day_notes():
     
     # Test list_notes (all notes)
     print("\n5. Listing all notes...")
-    all_notes = list_notes()
-    print(f"Total notes in database: {len(all_notes)}")
+    note_count = sum(1 for _ in list_notes())     # list_notes() streams rows
+    print(f"Total notes in database: {note_count}")
     
     # Test get_yestedays_note
     print("\n6. Getting yesterday's notes...")
@@ -124,13 +130,120 @@ def test_end_of_day_notes():
     remaining_notes = get_todays_note()
     print(f"Remaining today's notes: {len(remaining_notes)}")
 
+def _overlapping_pairs(rows) -> set:
+    """Every overlapping pair of task ids, found by comparing each pair directly."""
+    pairs = set()
+    for i, a in enumerate(rows):
+        for b in rows[i + 1:]:
+            if a[1] < b[2] and b[1] < a[2] and a[1] < a[2] and b[1] < b[2]:
+                pairs.add(frozenset((a[0], b[0])))
+    return pairs
+
+def test_task_interval_index():
+    """Interval index used for schedule conflicts (see DBMiddleware_task_conflicts)."""
+    print("\n--- Testing task conflict index ---")
+    # Touching slots don't overlap; a slot covers [FromTime, ToTime)
+    index = TaskIntervalIndex([(1, '09:00', '09:30', 'A'), (2, '09:30', '10:00', 'B')])
+    print(index.overlapping(9 * 60, 9 * 60 + 30) == [(1, '09:00', '09:30', 'A')])
+    print(index.all_overlaps() == [])
+
+    # Removing the longest interval shrinks the search window without losing matches
+    index = TaskIntervalIndex([(1, '08:00', '12:00', 'Long'), (2, '11:00', '11:45', 'Short'),
+                               (3, '11:30', '12:15', 'Late')])
+    index.remove(1)
+    print(len(index) == 2)
+    print([row[0] for row in index.overlapping(12 * 60 + 10, 12 * 60 + 20)] == [3])
+    print([row[0] for row in index.overlapping(11 * 60 + 40, 12 * 60)] == [2, 3])
+    print([row[0] for row in index.overlapping(9 * 60, 10 * 60)] == [])
+
+    # Deactivating a task takes it out of the conflicts (incremental update)
+    first = add_task('21:00', '21:30', 'Conflict test A')
+    second = add_task('21:15', '21:45', 'Conflict test B')
+    print([row[0] for row in find_task_conflicts('21:10', '21:20')] == [first, second])
+    toggle_task_active(second)
+    print([row[0] for row in find_task_conflicts('21:10', '21:20')] == [first])
+    toggle_task_active(second)
+    print([row[0] for row in find_task_conflicts('21:10', '21:20')] == [first, second])
+
+    # After a bulk add the index matches the table, and the sweep matches a pairwise check
+    add_tasks([('22:00', '23:00', 'Bulk 1', 1), ('22:30', '22:45', 'Bulk 2', 1),
+               ('22:45', '23:30', 'Bulk 3', 1), ('23:30', '23:45', 'Bulk 4', 0)])
+    rows = run_sql("SELECT id, FromTime, ToTime, TaskName FROM tasks WHERE Active = 1")
+    index = get_task_interval_index()
+    indexed = sorted(row[0] for row in index.overlapping(0, 24 * 60))
+    print(len(index) == len(indexed) and indexed == sorted(row[0] for row in rows if row[1] < row[2]))
+    swept = {frozenset((a[0], b[0])) for a, b in find_all_task_conflicts()}
+    print(swept == _overlapping_pairs(rows))
+
+def test_sync_replica():
+    """Two-way sync with a replica file (see DBSync)."""
+    print("\n--- Testing replica sync ---")
+    with tempfile.TemporaryDirectory() as folder:
+        replica_path = os.path.join(folder, 'replica.db')
+        init_replica(replica_path)
+        replica = sqlite3.connect(replica_path)
+        replica_note = lambda text: replica.execute(
+            "INSERT INTO end_of_day_notes (note, DateAdded) VALUES (?, date('now'))", (text,)).lastrowid
+
+        # A note added and deleted on the replica must not delete main's note with the same id
+        main_id = add_note("MAIN-ONLY important note")
+        replica_id = replica_note("Replica note, deleted again")
+        replica.execute("DELETE FROM end_of_day_notes WHERE id = ?", (replica_id,))
+        replica.commit()
+        print(replica_id == main_id)
+        sync_replica(replica_path)
+        print(get_note(main_id) is not None and get_note(main_id)[1] == "MAIN-ONLY important note")
+        print(replica.execute("SELECT note FROM end_of_day_notes WHERE id = ?", (main_id,)).fetchone()
+              == ("MAIN-ONLY important note",))
+
+        # Both sides add a note under the same id: both notes are kept on both sides
+        main_id = add_note("Added on main")
+        replica_id = replica_note("Added on the replica")
+        replica.commit()
+        pulled, pushed = sync_replica(replica_path)
+        print(replica_id == main_id and pulled.renumbered == 1)
+        texts = {"Added on main", "Added on the replica"}
+        print({row[0] for row in run_sql("SELECT note FROM end_of_day_notes")} >= texts)
+        print({row[0] for row in replica.execute("SELECT note FROM end_of_day_notes")} >= texts)
+
+        # A task edited on both sides, settled by each policy
+        task_id = add_task('05:00', '05:15', 'Sync test')
+        sync_replica(replica_path)
+        def edit_both(first, second, replica_first):
+            if replica_first:
+                replica.execute("UPDATE tasks SET TaskName = ? WHERE id = ?", (first, task_id))
+                replica.commit()
+                time.sleep(0.01)
+                update_task(task_id, task_name=second)
+            else:
+                update_task(task_id, task_name=first)
+                time.sleep(0.01)
+                replica.execute("UPDATE tasks SET TaskName = ? WHERE id = ?", (second, task_id))
+                replica.commit()
+        def both_names():
+            return get_task(task_id)[3], replica.execute("SELECT TaskName FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+        edit_both('Replica edit', 'Main edit (newer)', replica_first=True)
+        sync_replica(replica_path)                      # newest wins
+        print(both_names() == ('Main edit (newer)', 'Main edit (newer)'))
+        edit_both('Replica edit (older)', 'Main edit', replica_first=True)
+        sync_replica(replica_path, policy='source')     # the replica's edit wins the pull
+        print(both_names() == ('Replica edit (older)', 'Replica edit (older)'))
+        edit_both('Main edit (older)', 'Replica edit', replica_first=False)
+        sync_replica(replica_path, policy='target')     # main's edit is kept and sent back
+        print(both_names() == ('Main edit (older)', 'Main edit (older)'))
+        replica.close()
 
 # -----------------------------
 # Run tests
 # -----------------------------
 if __name__ == "__main__":
+    # Run against an in-memory copy so the notes these tests add never reach MorningRoutine.db
+    open_db(mode='copy')
     test_select_all_tasks()
     test_select_all_house_maint_tasks()
     test_get_house_maint_task_by_date()
+    test_get_house_maint_schedule()
     test_end_of_day_notes()
+    test_task_interval_index()
+    test_sync_replica()
 